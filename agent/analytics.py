@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Cohort analytics over assessment results.
+
+Records are read from NDJSON (one assessment per line), a JSON array
+(an AssessmentStore export) or a directory of per-assessment JSON files.
+Each record is decoded once into integer-coded columns; every report is then
+a bincount over those columns, so a quarterly review of several hundred
+thousand records costs one pass of JSON decoding plus a handful of counts.
+
+Reports:
+    loc_confusion.csv         indicated vs actual LOC counts
+    discrepancy_reasons.csv   reason frequencies among discrepant records
+    severity_distribution.csv per-domain severity counts (0-4, missing)
+    wm_rates.csv              WM indication rate, overall and per indicated LOC
+    analytics.json            all of the above in one document
+
+numpy is used for the counts when installed; otherwise a pure-Python
+fallback produces identical output.
+"""
+import csv, glob, json, os
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOC_REFERENCE = os.path.join(ROOT, "data", "loc_reference_neutral.json")
+DOMAINS = "ABCDEF"
+SEVERITY_LEVELS = 5  # 0-4
+MISSING = "(missing)"
+
+class Vocab:
+    """Maps category strings to dense integer codes; code 0 is MISSING."""
+    def __init__(self, seed=()):
+        self.labels = [MISSING]
+        self.codes = {}
+        for s in seed:
+            self.code(s)
+
+    def code(self, value):
+        if value is None or value == "":
+            return 0
+        value = str(value)
+        c = self.codes.get(value)
+        if c is None:
+            c = self.codes[value] = len(self.labels)
+            self.labels.append(value)
+        return c
+
+    def __len__(self):
+        return len(self.labels)
+
+def load_loc_codes(path=LOC_REFERENCE):
+    with open(path, "r", encoding="utf-8") as f:
+        return [l["code"] for l in json.load(f).get("levels", [])]
+
+def _get(rec, *paths):
+    for path in paths:
+        cur = rec
+        for k in path.split("."):
+            if not isinstance(cur, dict) or k not in cur:
+                break
+            cur = cur[k]
+        else:
+            return cur
+    return None
+
+def _source(rec):
+    """Fixtures wrap the assessment in "input"; read it the way rulesets.build_state does."""
+    src = rec.get("input")
+    return src if isinstance(src, dict) else rec
+
+def _severities(src):
+    sev = src.get("severities")
+    if isinstance(sev, dict):
+        return sev
+    out = {}
+    for d in src.get("domains") or []:
+        # AssessmentStore domains carry number 1-6 instead of a letter key
+        n = d.get("number") if isinstance(d, dict) else None
+        if isinstance(n, int) and 1 <= n <= 6:
+            out[DOMAINS[n - 1]] = d.get("severity")
+    return out
+
+def iter_records(source):
+    """Yield assessment dicts from an NDJSON file, a JSON array/object file or a directory."""
+    if os.path.isdir(source):
+        for p in sorted(glob.glob(os.path.join(source, "*.json"))):
+            yield from iter_records(p)
+        return
+    with open(source, "r", encoding="utf-8") as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        if first == "[" or (first == "{" and not source.endswith((".ndjson", ".jsonl"))):
+            obj = json.loads(first + f.read())
+            if isinstance(obj, dict):
+                obj = obj.get("assessments", [obj])
+            yield from obj
+            return
+        line = first + f.readline()
+        while line:
+            if line.strip():
+                yield json.loads(line)
+            line = f.readline()
+
+class Columns:
+    """Integer-coded columnar view of a batch of assessment results."""
+    def __init__(self, loc_codes=()):
+        self.loc = Vocab(loc_codes)
+        self.reason = Vocab()
+        self.indicated = array("i")
+        self.actual = array("i")
+        self.wm = array("b")            # -1 unknown, 0 no, 1 yes
+        self.severity = {d: array("b") for d in DOMAINS}  # -1 missing
+        self.reason_codes = array("i")  # flattened, paired with reason_rows
+        self.reason_rows = array("i")
+
+    def __len__(self):
+        return len(self.indicated)
+
+    def append(self, rec):
+        row = len(self.indicated)
+        src = _source(rec)
+        self.indicated.append(self.loc.code(_get(src, "indicated_loc", "loc.indicated", "locRecommendation.code")))
+        self.actual.append(self.loc.code(_get(src, "actual_loc", "loc.actual")))
+        wm = _get(src, "wm_indicated", "wm.indicated")
+        self.wm.append(-1 if wm is None else int(bool(wm)))
+        sev = _severities(src)
+        for d in DOMAINS:
+            v = sev.get(d)
+            self.severity[d].append(v if isinstance(v, int) and 0 <= v < SEVERITY_LEVELS else -1)
+        reasons = _get(src, "discrepancy_reasons", "loc.discrepancy_reasons") or []
+        if not isinstance(reasons, list):
+            reasons = [reasons]  # a single free-text reason, not a list of characters
+        for r in reasons:
+            self.reason_codes.append(self.reason.code(r))
+            self.reason_rows.append(row)
+
+def load_columns(sources, loc_codes=None):
+    cols = Columns(load_loc_codes() if loc_codes is None else loc_codes)
+    for src in sources:
+        for rec in iter_records(src):
+            cols.append(rec)
+    return cols
+
+def _bincount(codes, size, weights=None):
+    if np is not None:
+        c = np.asarray(codes, dtype=np.intc)
+        w = None if weights is None else np.asarray(weights, dtype=np.float64)
+        return np.bincount(c, weights=w, minlength=size).tolist()
+    out = [0] * size
+    if weights is None:
+        for c in codes:
+            out[c] += 1
+    else:
+        for c, w in zip(codes, weights):
+            out[c] += w
+    return out
+
+def _shift(col, by):
+    return np.asarray(col, dtype=np.intc) + by if np is not None else array("i", (v + by for v in col))
+
+def _combine(a, b, n):
+    if np is not None:
+        return np.asarray(a, dtype=np.intc) * n + np.asarray(b, dtype=np.intc)
+    return array("i", (x * n + y for x, y in zip(a, b)))
+
+def confusion(cols):
+    n = len(cols.loc)
+    flat = _bincount(_combine(cols.indicated, cols.actual, n), n * n)
+    return [flat[i * n:(i + 1) * n] for i in range(n)]
+
+def discrepancy_reasons(cols):
+    """Reason frequencies over records where both LOCs are known and indicated != actual."""
+    if np is not None:
+        ind, act = np.asarray(cols.indicated, dtype=np.intc), np.asarray(cols.actual, dtype=np.intc)
+        discrepant = (ind != act) & (ind > 0) & (act > 0)
+    else:
+        discrepant = [i != a and i > 0 and a > 0 for i, a in zip(cols.indicated, cols.actual)]
+    n_disc = int(sum(discrepant))
+    if np is not None and len(cols.reason_rows):
+        rows = np.asarray(cols.reason_rows, dtype=np.intc)
+        keep = discrepant[rows]
+        codes = np.asarray(cols.reason_codes, dtype=np.intc)[keep]
+        with_reason = len(np.unique(rows[keep]))
+    else:
+        keep = [discrepant[r] for r in cols.reason_rows]
+        codes = [c for c, k in zip(cols.reason_codes, keep) if k]
+        with_reason = len({r for r, k in zip(cols.reason_rows, keep) if k})
+    counts = _bincount(codes, len(cols.reason))
+    return {
+        "discrepant": n_disc,
+        "missing_reason": n_disc - with_reason,
+        "reasons": {cols.reason.labels[i]: int(c) for i, c in enumerate(counts) if i and c},
+    }
+
+def severity_distribution(cols):
+    out = {}
+    for d in DOMAINS:
+        counts = _bincount(_shift(cols.severity[d], 1), SEVERITY_LEVELS + 1)
+        out[d] = {MISSING: int(counts[0]), **{str(s): int(counts[s + 1]) for s in range(SEVERITY_LEVELS)}}
+    return out
+
+def wm_rates(cols):
+    n = len(cols.loc)
+    if np is not None:
+        wm = np.asarray(cols.wm, dtype=np.int8)
+        known, yes = wm >= 0, wm == 1
+    else:
+        known = [1 if v >= 0 else 0 for v in cols.wm]
+        yes = [1 if v == 1 else 0 for v in cols.wm]
+    known_by = _bincount(cols.indicated, n, known)
+    yes_by = _bincount(cols.indicated, n, yes)
+    def rate(y, k):
+        return {"assessed": int(k), "indicated": int(y), "rate": round(y / k, 4) if k else None}
+    groups = {cols.loc.labels[i]: rate(yes_by[i], known_by[i]) for i in range(n) if known_by[i]}
+    return {"overall": rate(sum(yes_by), sum(known_by)), "by_indicated_loc": groups}
+
+def build_report(cols):
+    labels = cols.loc.labels
+    matrix = confusion(cols)
+    used = [i for i in range(len(labels)) if any(matrix[i]) or any(row[i] for row in matrix)]
+    return {
+        "records": len(cols),
+        "loc_confusion": {
+            "labels": [labels[i] for i in used],
+            "matrix": [[int(matrix[i][j]) for j in used] for i in used],
+        },
+        "discrepancy": discrepancy_reasons(cols),
+        "severity_distribution": severity_distribution(cols),
+        "wm": wm_rates(cols),
+    }
+
+def write_report(report, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    def w(name, header, rows):
+        p = os.path.join(out_dir, name)
+        with open(p, "w", encoding="utf-8", newline="") as f:
+            cw = csv.writer(f)
+            cw.writerow(header)
+            cw.writerows(rows)
+        paths.append(p)
+
+    cm = report["loc_confusion"]
+    w("loc_confusion.csv", ["indicated\\actual"] + cm["labels"],
+      [[lab] + row for lab, row in zip(cm["labels"], cm["matrix"])])
+    disc = report["discrepancy"]
+    w("discrepancy_reasons.csv", ["reason", "count"],
+      sorted(disc["reasons"].items(), key=lambda kv: (-kv[1], kv[0])) + [[MISSING, disc["missing_reason"]]])
+    sev = report["severity_distribution"]
+    levels = [str(s) for s in range(SEVERITY_LEVELS)] + [MISSING]
+    w("severity_distribution.csv", ["domain"] + levels, [[d] + [sev[d][l] for l in levels] for d in DOMAINS])
+    wm = report["wm"]
+    w("wm_rates.csv", ["indicated_loc", "assessed", "wm_indicated", "rate"],
+      [["(all)", wm["overall"]["assessed"], wm["overall"]["indicated"], wm["overall"]["rate"]]] +
+      [[k, v["assessed"], v["indicated"], v["rate"]] for k, v in wm["by_indicated_loc"].items()])
+    p = os.path.join(out_dir, "analytics.json")
+    with open(p, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    paths.append(p)
+    return paths
@@ -1,74 +1,416 @@
 #!/usr/bin/env python3
-import argparse, json, os, subprocess, sys, hashlib, random, string
+"""
+asm.py - agent CLI.
+
+Subcommands are registered with @command(name, help, args). A command's
+modules are imported inside its function and its options (args) are only
+added to the parser when that command is the one being run, so the cost of
+every invocation stays that of the command it runs. Argument-less commands
+(rand.id, scaffold) skip argparse entirely.
+
+Keep module-level imports to os/sys/tracing; scripts/check-asm-startup.py
+fails CI if a trivial command's cold start exceeds its budget or pulls in
+heavy modules. To see where startup time goes:
+
+    python3 agent/asm.py --profile-imports rand.id     (or ASM_PROFILE_IMPORTS=1)
+"""
+import os, sys
+import tracing
+from tracing import span
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+
+COMMANDS = {}  # name -> (func, help, args); args(parser) adds the command's options
+
+def command(name, help, args=None):
+    def register(func):
+        COMMANDS[name] = (func, help, args)
+        return func
+    return register
 
 def rand_id(n=8):
-    import secrets, string
-    alphabet = string.ascii_letters + string.digits
-    return ''.join(secrets.choice(alphabet) for _ in range(n))
+    # os.urandom with rejection sampling: same guarantees as secrets.choice
+    # without importing secrets/random/hashlib on every call
+    out = []
+    while len(out) < n:
+        for b in os.urandom(2 * n):
+            if b < 248 and len(out) < n:  # 248 = 4 * 62, keeps the choice unbiased
+                out.append(ALPHABET[b % 62])
+    return "".join(out)
 
-def canonical_bytes(obj) -> bytes:
-    return json.dumps(obj, sort_keys=True, separators=(",", ":")).encode("utf-8")
+def _in_args(p):
+    p.add_argument("--in", dest="infile", required=True)
 
+@command("scaffold", "create output directories")
 def cmd_scaffold(args):
     os.makedirs("out", exist_ok=True)
     print("Scaffold complete. Place your ASAM PDF at assets/ASAM_TreatmentPlan_Template.pdf")
 
+def load_plan(path):
+    import json
+    with span("plan.load", path=path) as s:
+        with open(path, "r", encoding="utf-8") as f:
+            data = f.read()
+        s.set(bytes=len(data))
+        return json.loads(data)
+
+@command("plan.hash", "print the SHA-256 of a plan's canonical JSON", _in_args)
 def cmd_plan_hash(args):
-    with open(args.infile, "r", encoding="utf-8") as f:
-        obj = json.load(f)
-    h = hashlib.sha256(canonical_bytes(obj)).hexdigest()
+    import hashlib
+    from plans import canonical_bytes
+    obj = load_plan(args.infile)
+    with span("plan.canonicalize"):
+        data = canonical_bytes(obj)
+    with span("plan.hash", bytes=len(data)):
+        h = hashlib.sha256(data).hexdigest()
     print(h)
 
+@command("plan.validate", "check a plan's required fields", _in_args)
 def cmd_plan_validate(args):
-    with open(args.infile, "r", encoding="utf-8") as f:
-        plan = json.load(f)
-    errs = []
-    if not plan.get("patientFullName"): errs.append("patientFullName is required")
-    if not plan.get("levelOfCare"): errs.append("levelOfCare is required")
-    if not isinstance(plan.get("problems", []), list): errs.append("problems must be a list")
+    from plans import plan_errors
+    plan = load_plan(args.infile)
+    with span("plan.validate") as s:
+        errs = plan_errors(plan)
+        s.set(errors=len(errs))
     if errs:
         for e in errs: print(f"error: {e}", file=sys.stderr)
         sys.exit(1)
     print("ok")
 
+def pdf_export_exe():
+    exe = os.environ.get("PDF_EXPORT_EXE") or os.path.join(ROOT, "tools", "pdf_export", "pdf_export")
+    if not os.path.exists(exe):
+        print("pdf_export not built. Run VS Code task: Agent: Build pdf_export", file=sys.stderr)
+        sys.exit(2)
+    return exe
+
+def _pdf_export_args(p):
+    p.add_argument("--plan", required=True); p.add_argument("--pdf", required=True)
+    p.add_argument("--sig", required=False); p.add_argument("--out", required=True)
+
+@command("pdf.export", "fill the PDF template from one plan", _pdf_export_args)
 def cmd_pdf_export(args):
+    import subprocess
     pdf = os.path.abspath(args.pdf)
     plan = os.path.abspath(args.plan)
     sig = os.path.abspath(args.sig) if args.sig else ""
     out = os.path.abspath(args.out)
-    exe = os.path.join(ROOT, "tools", "pdf_export", "pdf_export")
-    if not os.path.exists(exe):
-        print("pdf_export not built. Run VS Code task: Agent: Build pdf_export", file=sys.stderr)
-        sys.exit(2)
+    exe = pdf_export_exe()
     os.makedirs(os.path.dirname(out), exist_ok=True)
     cmd = [exe, "--pdf", pdf, "--plan", plan, "--out", out]
     if sig: cmd += ["--sig", sig]
-    subprocess.check_call(cmd)
+    with span("pdf.fill", exe=os.path.basename(exe)):
+        subprocess.check_call(cmd)
+    with span("pdf.stat") as s:
+        s.set(bytes=os.path.getsize(out))
     print(f"Wrote {out}")
 
+def _pdf_batch_args(p):
+    p.add_argument("--plans", nargs="+", required=True); p.add_argument("--pdf", required=True)
+    p.add_argument("--sig", required=False); p.add_argument("--out-dir", default="out/export")
+    p.add_argument("--checkpoint", help="resume file (default: <out-dir>/export_checkpoint.ndjson)")
+    p.add_argument("--fill-workers", type=int, help="concurrent pdf_export processes (default: CPU count)")
+    p.add_argument("--queue-size", type=int, default=8, help="bound on each inter-stage queue")
+
+@command("pdf.batch", "export many plans through the staged pipeline", _pdf_batch_args)
+def cmd_pdf_batch(args):
+    import export_pipeline
+    exe = pdf_export_exe()
+    out_dir = os.path.abspath(args.out_dir)
+    checkpoint = args.checkpoint or os.path.join(out_dir, "export_checkpoint.ndjson")
+    limits = {"fill": args.fill_workers} if args.fill_workers else None
+    try:
+        results = export_pipeline.run(args.plans, exe=exe, template=os.path.abspath(args.pdf), out_dir=out_dir,
+                                      sig=os.path.abspath(args.sig) if args.sig else None,
+                                      checkpoint=checkpoint, limits=limits, queue_size=args.queue_size)
+    except OSError as e:  # template or signature image unreadable
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(2)
+    counts = {}
+    for r in results:
+        counts[r.status] = counts.get(r.status, 0) + 1
+        if r.status in ("failed", "blocked"):
+            print(f"{r.status}: {os.path.basename(r.plan_path)}{' at ' + r.stage if r.stage else ''}: {r.error}", file=sys.stderr)
+    print(", ".join(f"{n} {k}" for k, n in sorted(counts.items())) or "nothing to export")
+    print(f"Checkpoint: {checkpoint}")
+    if counts.get("failed") or counts.get("blocked"): sys.exit(1)
+
+def _pdf_overflow_args(p):
+    p.add_argument("--plans", nargs="+", required=True); p.add_argument("--pdf", required=True)
+    p.add_argument("--map", default=os.path.join(ROOT, "FORM_FIELD_MAP.json"), help="PDF field -> plan value key")
+    p.add_argument("--out", help="write every measurement as JSON lines")
+
+@command("pdf.overflow", "predict which mapped fields overflow the template, without rendering", _pdf_overflow_args)
+def cmd_pdf_overflow(args):
+    import json
+    import overflow, pdf_form
+    try:
+        field_map = overflow.load_field_map(args.map)
+        with span("pdf.overflow.template"):
+            template = overflow.load_template(args.pdf, field_map.keys())
+    except (OSError, pdf_form.FormError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(2)
+    for name in template.missing:
+        print(f"warning: template has no text field {name}", file=sys.stderr)
+    out = open(args.out, "w", encoding="utf-8") if args.out else None
+    plans = overflowing = failed = 0
+    try:
+        with span("pdf.overflow.measure") as s:
+            for path, plan_id, results, error in overflow.predict_batch(args.plans, args.pdf, field_map):
+                plans += 1
+                if error:
+                    failed += 1
+                    print(f"failed: {os.path.basename(path)}: {error}", file=sys.stderr)
+                    continue
+                for r in results:
+                    if out: out.write(json.dumps(dict(r, plan=path, plan_id=plan_id), sort_keys=True) + "\n")
+                    if r["overflow"]:
+                        overflowing += 1
+                        if r["max_len"] is not None and r["chars"] > r["max_len"]:
+                            why = f"{r['chars']} chars, MaxLen {r['max_len']}"
+                        elif r["multiline"]:
+                            why = f"needs {r['lines']} lines, fits {r['max_lines']} at {r['size']:g}pt ({r['chars']} chars)"
+                        else:
+                            why = f"text {r['text_width']:g}pt wide, box {r['box_width']:g}pt at {r['size']:g}pt ({r['chars']} chars)"
+                        print(f"{os.path.basename(path)}: {r['field']} {why}")
+            s.set(plans=plans)
+    finally:
+        if out: out.close()
+    print(f"{plans} plan(s), {overflowing} overflowing field(s)" + (f", {failed} unreadable" if failed else ""))
+    if overflowing or failed: sys.exit(1)
+
+def _analytics_args(p):
+    p.add_argument("--in", dest="inputs", nargs="+", required=True, help="NDJSON, JSON array or directory of assessment results")
+    p.add_argument("--out", default="out/analytics")
+
+@command("analytics", "LOC confusion, discrepancy and severity reports", _analytics_args)
+def cmd_analytics(args):
+    import analytics
+    with span("analytics.load") as s:
+        cols = analytics.load_columns(args.inputs)
+        s.set(records=len(cols))
+    with span("analytics.report"):
+        report = analytics.build_report(cols)
+    with span("analytics.write"):
+        paths = analytics.write_report(report, args.out)
+    for p in paths:
+        print(f"Wrote {p}")
+    print(f"{report['records']} records, {report['discrepancy']['discrepant']} LOC discrepancies "
+          f"({report['discrepancy']['missing_reason']} without reason)")
+
+def _phi_scrub_args(p):
+    p.add_argument("--in", dest="infile", required=True); p.add_argument("--out", required=True)
+    p.add_argument("--rules", help="JSON map of field path -> action (default: built-in rules)")
+    p.add_argument("--key-file", help="pseudonym key file (default: $PHI_SCRUB_KEY)")
+    p.add_argument("--workers", type=int, default=None)
+
+@command("phi.scrub", "de-identify assessment exports", _phi_scrub_args)
+def cmd_phi_scrub(args):
+    import phi_scrub
+    try:
+        key = phi_scrub.load_key(args.key_file)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(2)
+    rules = phi_scrub.load_rules(args.rules)
+    out = os.path.abspath(args.out)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with span("phi.scrub", workers=args.workers) as s, open(out + ".tmp", "w", encoding="utf-8") as f:
+        n = phi_scrub.scrub_stream(phi_scrub.iter_records(args.infile), f, key, rules, args.workers)
+        s.set(records=n)
+    os.replace(out + ".tmp", out)
+    print(f"Wrote {out} ({n} records)")
+
+def _registry(args):
+    import rulesets
+    roots = args.rules_dir or rulesets.DEFAULT_ROOTS
+    try:
+        with span("rules.discover"):
+            return rulesets.RulesetRegistry(roots, budget_bytes=int(args.cache_mb * 1024 * 1024),
+                                              max_compiled=args.max_compiled)
+    except rulesets.RulesetError as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+def _rules_args(p):
+    p.add_argument("--rules-dir", action="append", help="ruleset root to scan (repeatable; default agent_ops/rules)")
+    p.add_argument("--cache-mb", type=float, default=64.0,
+                   help="memory budget for compiled rulesets, each measured with tracemalloc when compiled")
+    p.add_argument("--max-compiled", type=int, default=64, help="secondary cap on the number of compiled rulesets cached")
+
+@command("rules.list", "list discovered ruleset editions", _rules_args)
+def cmd_rules_list(args):
+    reg = _registry(args)
+    for info in reg.rulesets():
+        mark = "*" if info.key == reg.default else " "
+        print(f"{mark} {info.key:<16} {(info.sha256 or '-')[:12]:<12}  {os.path.relpath(info.path, ROOT)}")
+
+def _rules_eval_args(p):
+    _rules_args(p)
+    p.add_argument("--in", dest="infile", required=True); p.add_argument("--out")
+
+@command("rules.eval", "re-score assessments under their pinned ruleset", _rules_eval_args)
+def cmd_rules_eval(args):
+    import json
+    import analytics, rulesets
+    reg = _registry(args)
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    failed = 0
+    try:
+        for rec in analytics.iter_records(args.infile):
+            try:
+                with span("rules.evaluate"):
+                    res = reg.evaluate(rec)
+            except rulesets.RulesetError as e:
+                res = {"error": str(e)}
+                failed += 1
+            res["id"] = rec.get("id") or rec.get("assessment_id") or rec.get("title")
+            out.write(json.dumps(res, sort_keys=True) + "\n")
+    finally:
+        if args.out: out.close()
+    print(f"cache: {reg.stats}", file=sys.stderr)
+    if failed: sys.exit(1)
+
+def _emr_serve_args(p):
+    p.add_argument("--patients", help="test patients JSON (default data/test_patients.json)")
+    p.add_argument("--port", type=int, default=8765); p.add_argument("--latency", type=float, default=0.0, help="seconds added per fetch")
+
+@command("emr.serve", "run the local EMR stand-in server over test patients", _emr_serve_args)
+def cmd_emr_serve(args):
+    import emr_context
+    backend = emr_context.StandInBackend(args.patients or emr_context.TEST_PATIENTS, latency=args.latency)
+    server = emr_context.serve(backend, port=args.port)
+    print(f"EMR stand-in on http://127.0.0.1:{server.server_address[1]} ({len(backend.by_mrn)} patients); Ctrl-C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print()
+    finally:
+        server.server_close()
+
+def _emr_get_args(p):
+    p.add_argument("--mrn", action="append", default=[]); p.add_argument("--fin", action="append", default=[])
+    p.add_argument("--url", help="EMR context service (default $EMR_CONTEXT_URL)")
+    p.add_argument("--stand-in", action="store_true", help="use the in-process stand-in over test patients instead of a service")
+    p.add_argument("--ttl-mrn", type=float, help="seconds (default 3600)"); p.add_argument("--ttl-fin", type=float, help="seconds (default 900)")
+    p.add_argument("--max-entries", type=int, default=1024); p.add_argument("--workers", type=int, default=8)
+
+@command("emr.get", "fetch read-only EMR context snapshots through the TTL cache", _emr_get_args)
+def cmd_emr_get(args):
+    import json
+    from concurrent.futures import ThreadPoolExecutor
+    import emr_context
+    url = args.url or os.environ.get("EMR_CONTEXT_URL")
+    if args.stand_in:
+        backend = emr_context.StandInBackend()
+    elif url:
+        backend = emr_context.HttpBackend(url, token=os.environ.get("EMR_CONTEXT_TOKEN"))
+    else:
+        print("error: pass --url (or set EMR_CONTEXT_URL), or --stand-in for test patients", file=sys.stderr)
+        sys.exit(2)
+    ttl = {k: v for k, v in (("mrn", args.ttl_mrn), ("fin", args.ttl_fin)) if v is not None}
+    lookups = [{"mrn": m} for m in args.mrn] + [{"fin": f} for f in args.fin]
+    if not lookups:
+        print("error: pass at least one --mrn or --fin", file=sys.stderr)
+        sys.exit(2)
+
+    def one(kw):
+        try:
+            return cache.get(**kw).as_dict()
+        except emr_context.EMRError as e:
+            return dict(kw, error=str(e))
+
+    with emr_context.EMRContextCache(backend, ttl=ttl, max_entries=args.max_entries) as cache:
+        with ThreadPoolExecutor(args.workers) as pool:
+            results = list(pool.map(one, lookups))
+        for r in results:
+            print(json.dumps(r, sort_keys=True))
+        print(f"cache: {cache.metrics()}", file=sys.stderr)
+    if any("error" in r for r in results): sys.exit(1)
+
+def _watch_args(p):
+    p.add_argument("--interval", type=float, default=0.2, help="poll interval in seconds")
+    p.add_argument("--once", action="store_true", help="run all fixtures and lint once, then exit")
+
+@command("watch", "re-run affected fixtures as rules/questionnaires change", _watch_args)
+def cmd_watch(args):
+    import watch
+    w = watch.Watcher()
+    if args.once:
+        lines = w.run_all()
+        for line in lines: print(line)
+        sys.exit(1 if any(ok is False for ok, _ in w.results.values()) else 0)
+    try:
+        w.loop(args.interval)
+    except KeyboardInterrupt:
+        print()
+
+@command("rand.id", "print a random 8-character id")
 def cmd_rand_id(args):
     print(rand_id())
 
-def main():
-    ap = argparse.ArgumentParser(prog="asm.py")
-    sp = ap.add_subparsers(dest="cmd")
+# MARK: - Dispatch
 
-    p = sp.add_parser("scaffold"); p.set_defaults(func=cmd_scaffold)
-    p = sp.add_parser("plan.hash"); p.add_argument("--in", dest="infile", required=True); p.set_defaults(func=cmd_plan_hash)
-    p = sp.add_parser("plan.validate"); p.add_argument("--in", dest="infile", required=True); p.set_defaults(func=cmd_plan_validate)
-    p = sp.add_parser("pdf.export")
-    p.add_argument("--plan", required=True); p.add_argument("--pdf", required=True)
-    p.add_argument("--sig", required=False); p.add_argument("--out", required=True)
-    p.set_defaults(func=cmd_pdf_export)
+class _Args:
+    """argparse.Namespace stand-in for the no-argparse fast path."""
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
 
-    p = sp.add_parser("rand.id"); p.set_defaults(func=cmd_rand_id)
-
-    args = ap.parse_args()
+def parse_args(argv, name):
+    import argparse
+    ap = argparse.ArgumentParser(prog="asm.py")
+    ap.add_argument("--trace", metavar="PATH", help="write spans to PATH (.json = Chrome trace, else JSON lines); default $ASM_TRACE")
+    ap.add_argument("--trace-sample", type=float, metavar="RATE", help="fraction of runs to trace (default $ASM_TRACE_SAMPLE or 1.0)")
+    ap.add_argument("--profile-imports", action="store_true", help="report the slowest imports of this run (or $ASM_PROFILE_IMPORTS=1)")
+    sp = ap.add_subparsers(dest="cmd")
+    for n, (func, help, add_args) in COMMANDS.items():
+        p = sp.add_parser(n, help=help)
+        if n == name and add_args:
+            add_args(p)
+    args = ap.parse_args(argv)
     if not args.cmd:
         ap.print_help(); sys.exit(1)
-    args.func(args)
+    return args
+
+def profile_imports(argv, top=15):
+    """Re-run asm.py under -X importtime and print the slowest imports to stderr."""
+    import subprocess
+    env = dict(os.environ)
+    env.pop("ASM_PROFILE_IMPORTS", None)
+    r = subprocess.run([sys.executable, "-X", "importtime", os.path.abspath(__file__)] + argv,
+                       env=env, stderr=subprocess.PIPE, text=True)
+    rows = []
+    for line in r.stderr.splitlines():
+        if not line.startswith("import time:"):
+            print(line, file=sys.stderr)  # the command's own stderr
+            continue
+        self_us, cum_us, module = line[len("import time:"):].split("|", 2)
+        if self_us.strip().isdigit():
+            rows.append((int(cum_us), int(self_us), module.strip()))
+    print(f"\nimports: {len(rows)} modules, {sum(r[1] for r in rows) / 1000:.1f} ms", file=sys.stderr)
+    print(f"{'cumulative':>12} {'self':>9}  module", file=sys.stderr)
+    for cum, own, module in sorted(rows, reverse=True)[:top]:
+        print(f"{cum / 1000:9.1f} ms {own / 1000:6.1f} ms  {module}", file=sys.stderr)
+    return r.returncode
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if "--profile-imports" in argv or os.environ.get("ASM_PROFILE_IMPORTS"):
+        sys.exit(profile_imports([a for a in argv if a != "--profile-imports"]))
+    name = next((a for a in argv if a in COMMANDS), None)
+    if name and argv == [name] and COMMANDS[name][2] is None:
+        args = _Args(cmd=name, trace=None, trace_sample=None)
+    else:
+        args = parse_args(argv, name)
+    try:
+        tracing.configure(args.trace, sample_rate=args.trace_sample)
+    except tracing.TracingError as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(2)
+    with span(f"asm.{args.cmd}"):
+        COMMANDS[args.cmd][0](args)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Read-only EMR context client with a TTL cache (T-0004).
+
+    backend = HttpBackend("http://127.0.0.1:8765")
+    with EMRContextCache(backend, ttl={"mrn": 3600, "fin": 900}) as cache:
+        snap = cache.get(mrn="TEST001234")
+        snap.data["allergies"], snap.age_hours
+
+Snapshots are cached per identifier ("mrn" or "fin", each with its own
+TTL) in a size-bounded LRU. Concurrent requests for the same patient share
+one backend fetch. An entry read during the last refresh_ahead fraction of
+its TTL is returned as-is and refreshed in the background, so hot patients
+never block on the EMR; an expired entry is fetched synchronously. A failed
+background refresh keeps the old snapshot until it expires.
+
+Backends implement fetch(kind, value) -> dict and raise EMRError. The
+stand-in server (asm.py emr.serve) answers the same HTTP API from
+data/test_patients.json, optionally with latency, for tests and demos:
+
+    GET /context/mrn/<MRN>    GET /context/fin/<FIN>    GET /_stats
+
+EMR context is display-only: nothing here writes to assessments.
+"""
+import json, os, threading, time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from tracing import span
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_PATIENTS = os.path.join(ROOT, "data", "test_patients.json")
+KINDS = ("mrn", "fin")
+DEFAULT_TTL = {"mrn": 3600.0, "fin": 900.0}
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_REFRESH_AHEAD = 0.2
+
+class EMRError(Exception):
+    pass
+
+class Snapshot:
+    __slots__ = ("kind", "value", "data", "fetched_at", "clock")
+
+    def __init__(self, kind, value, data, fetched_at, clock=time.time):
+        self.kind, self.value, self.data, self.fetched_at = kind, value, data, fetched_at
+        self.clock = clock  # the clock fetched_at was read from
+
+    @property
+    def age_hours(self):
+        return (self.clock() - self.fetched_at) / 3600
+
+    def as_dict(self):
+        """Shape read by validation_rules.json's emr_context_stale (age_hours vs cache_ttl_hours)."""
+        return {self.kind: self.value, "fetched_at": self.fetched_at, "age_hours": round(self.age_hours, 4),
+                "data": self.data}
+
+# MARK: - Backends
+
+class HttpBackend:
+    def __init__(self, base_url, timeout=5.0, token=None):
+        self.base_url, self.timeout, self.token = base_url.rstrip("/"), timeout, token
+
+    def fetch(self, kind, value):
+        import urllib.error, urllib.parse, urllib.request
+        req = urllib.request.Request(f"{self.base_url}/context/{kind}/{urllib.parse.quote(value, safe='')}",
+                                     headers={"Accept": "application/json"})
+        if self.token:
+            req.add_header("Authorization", f"Bearer {self.token}")
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as r:
+                return json.load(r)
+        except urllib.error.HTTPError as e:
+            raise EMRError(f"{kind} lookup failed: HTTP {e.code}") from None
+        except (OSError, ValueError) as e:
+            raise EMRError(f"{kind} lookup failed: {e}") from None
+
+def _context(patient, fin=None):
+    """Read-only context view of one test patient."""
+    clinical = patient.get("clinical") or {}
+    return {
+        "mrn": patient.get("mrn"),
+        "fin": fin or patient.get("fin_current"),
+        "allergies": clinical.get("allergies", []),
+        "medications": clinical.get("current_medications", []),
+        "diagnoses": [d for d in [clinical.get("primary_diagnosis")] + clinical.get("secondary_diagnoses", []) if d],
+        "visits": patient.get("visit_history", []),
+    }
+
+class StandInBackend:
+    """In-process EMR stand-in over test_patients.json; counts fetches per patient."""
+    def __init__(self, path=TEST_PATIENTS, latency=0.0):
+        with open(path, "r", encoding="utf-8") as f:
+            patients = json.load(f).get("test_patients", [])
+        self.latency = latency
+        self.by_mrn = {p["mrn"]: p for p in patients if p.get("mrn")}
+        self.by_fin = {}
+        for p in patients:
+            for fin in [p.get("fin_current")] + [v.get("fin") for v in p.get("visit_history", [])]:
+                if fin:
+                    self.by_fin.setdefault(fin, p)
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def fetch(self, kind, value):
+        with self._lock:
+            self.calls[f"{kind}:{value}"] = self.calls.get(f"{kind}:{value}", 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+        p = (self.by_mrn if kind == "mrn" else self.by_fin).get(value)
+        if p is None:
+            raise EMRError(f"{kind} not found")
+        return _context(p, value if kind == "fin" else None)
+
+def serve(backend, host="127.0.0.1", port=8765):
+    """HTTP server answering HttpBackend's API from backend; caller runs serve_forever()."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts = self.path.strip("/").split("/")
+            if parts == ["_stats"]:
+                return self._send(200, {"calls": getattr(backend, "calls", {})})
+            if len(parts) != 3 or parts[0] != "context" or parts[1] not in KINDS:
+                return self._send(404, {"error": "not found"})
+            from urllib.parse import unquote
+            try:
+                self._send(200, backend.fetch(parts[1], unquote(parts[2])))
+            except EMRError as e:
+                self._send(404, {"error": str(e)})
+
+        def _send(self, status, obj):
+            body = json.dumps(obj).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            pass  # request lines would carry MRNs
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+# MARK: - Cache
+
+class EMRContextCache:
+    def __init__(self, backend, ttl=None, max_entries=DEFAULT_MAX_ENTRIES, refresh_ahead=DEFAULT_REFRESH_AHEAD,
+                 refresh_workers=2, clock=time.time):
+        self.backend = backend
+        self.ttl = dict(DEFAULT_TTL, **(ttl or {}))
+        self.max_entries = max_entries
+        self.refresh_ahead = refresh_ahead
+        self.clock = clock
+        self._cache = OrderedDict()   # (kind, value) -> Snapshot
+        self._inflight = {}           # (kind, value) -> Future
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(refresh_workers, thread_name_prefix="emr-refresh")
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "refreshes": 0, "refresh_errors": 0,
+                      "evictions": 0, "errors": 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    def metrics(self):
+        with self._lock:
+            m = dict(self.stats, size=len(self._cache), inflight=len(self._inflight))
+        lookups = m["hits"] + m["misses"]
+        m["hit_rate"] = round(m["hits"] / lookups, 4) if lookups else None
+        return m
+
+    def get(self, mrn=None, fin=None):
+        """Snapshot for one patient, by FIN (encounter) if given, else MRN."""
+        kind, value = ("fin", fin) if fin else ("mrn", mrn)
+        if not value:
+            raise ValueError("mrn or fin is required")
+        key = (kind, str(value))
+        now = self.clock()
+        with self._lock:
+            snap = self._cache.get(key)
+            if snap is not None:
+                age = now - snap.fetched_at
+                if age < self.ttl[kind]:
+                    self._cache.move_to_end(key)
+                    self.stats["hits"] += 1
+                    if age >= self.ttl[kind] * (1 - self.refresh_ahead) and key not in self._inflight:
+                        fut = Future()
+                        try:
+                            self._pool.submit(self._fetch, key, fut, True)
+                        except RuntimeError:
+                            pass  # closed: serve the snapshot without refreshing it
+                        else:
+                            # _fetch needs the lock we hold to pop this, so registering after submit is safe
+                            self._inflight[key] = fut
+                            self.stats["refreshes"] += 1
+                    return snap
+            self.stats["misses"] += 1
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._inflight[key] = Future()
+            else:
+                self.stats["coalesced"] += 1
+        if leader:
+            self._fetch(key, fut, background=False)
+        return fut.result()
+
+    def invalidate(self, mrn=None, fin=None):
+        with self._lock:
+            self._cache.pop(("fin", fin) if fin else ("mrn", mrn), None)
+
+    def _fetch(self, key, fut, background):
+        """Fetch key into the cache and resolve fut; waiters coalesced on key block on fut."""
+        kind, value = key
+        try:
+            with span("emr.fetch", kind=kind, background=background):
+                data = self.backend.fetch(kind, value)
+            snap = Snapshot(kind, value, data, self.clock(), self.clock)
+        except BaseException as e:
+            # Resolve fut even on KeyboardInterrupt/SystemExit so coalesced waiters never hang
+            with self._lock:
+                self._inflight.pop(key, None)
+                self.stats["refresh_errors" if background else "errors"] += 1
+            fut.set_exception(e if isinstance(e, EMRError) else EMRError(f"{type(e).__name__}: {e}"))
+            if not isinstance(e, Exception):
+                raise
+            return
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._cache[key] = snap
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+                self.stats["evictions"] += 1
+        fut.set_result(snap)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Staged asyncio export pipeline (asm.py pdf.batch).
+
+    load -> validate -> seal -> fill -> archive
+
+Stages are connected by bounded queues, so a slow stage (usually fill,
+which runs the pdf_export binary) applies backpressure instead of letting
+loaded plans pile up in memory. Each stage runs its own number of workers.
+
+A failure in any stage is recorded against that item only; the item leaves
+the pipeline and the rest continue. Every finished item (ok, blocked or
+failed) is appended to a JSON-lines checkpoint, together with the template
+and signature image it was rendered with (path and SHA-256). On restart, a
+plan is skipped only if its seal, template and signature are all unchanged
+and its output file is still on disk, so a crash costs at most the items
+that were in flight and a new template or signature re-exports everything.
+
+Output files are named by plan id (never by patient name), reduced to a
+safe basename, and each one gets its SHA-256 recorded in the checkpoint.
+Two plans that map to the same output file (a duplicate id, or ids that
+differ only in stripped characters) never overwrite each other: the later
+one fails at seal, as does a plan whose output an earlier run already
+wrote for a different plan.
+"""
+import asyncio, hashlib, json, os, re
+from plans import plan_errors, plan_hash, short_seal
+from tracing import span
+
+_DONE = object()
+DEFAULT_LIMITS = {"load": 4, "validate": 2, "seal": 2, "fill": os.cpu_count() or 2, "archive": 2}
+
+class Item:
+    __slots__ = ("plan_path", "plan", "seal", "out", "sha256", "status", "stage", "error")
+
+    def __init__(self, plan_path):
+        self.plan_path = plan_path
+        self.plan = self.seal = self.out = self.sha256 = self.error = None
+        self.status, self.stage = "pending", None
+
+    def record(self):
+        return {k: getattr(self, k) for k in ("plan_path", "seal", "out", "sha256", "status", "stage", "error")}
+
+def load_checkpoint(path):
+    done = {}
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    rec = json.loads(line)
+                    done[rec["plan_path"]] = rec  # last record per plan wins
+    return done
+
+def _output_name(plan, plan_path):
+    """Plan id (or the plan file's stem) as a file name that stays inside out_dir."""
+    for raw in (plan.get("id"), os.path.splitext(os.path.basename(plan_path))[0]):
+        name = re.sub(r"[^A-Za-z0-9._-]", "_", os.path.basename(str(raw or "").replace("\\", "/"))).lstrip(".")
+        if name:
+            return name
+    return "plan"
+
+def _sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+class ExportPipeline:
+    def __init__(self, exe, template, out_dir, sig=None, checkpoint=None, limits=None, queue_size=8):
+        self.exe, self.template, self.out_dir, self.sig = exe, template, out_dir, sig
+        self.checkpoint = checkpoint
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.queue_size = queue_size
+        self.results = []
+        self.inputs = {}    # template/sig paths and digests, recorded with every item
+        self._ckpt = None
+        self._claimed = {}  # output path -> plan_path that owns it
+
+    # MARK: - Stages. Each returns True to forward the item downstream.
+
+    async def load(self, item):
+        def read():
+            with open(item.plan_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        item.plan = await asyncio.to_thread(read)
+        return True
+
+    async def validate(self, item):
+        errs = plan_errors(item.plan)
+        if errs:
+            item.status, item.error = "blocked", "; ".join(errs)
+            return False
+        return True
+
+    async def seal(self, item):
+        item.seal = short_seal(await asyncio.to_thread(plan_hash, item.plan))
+        out = os.path.join(self.out_dir, _output_name(item.plan, item.plan_path) + ".pdf")
+        owner = self._claimed.setdefault(out, item.plan_path)
+        if owner != item.plan_path:
+            raise RuntimeError(f"output {os.path.basename(out)} already belongs to {os.path.basename(owner)}")
+        prev = self.previous.get(item.plan_path)
+        if (prev and prev.get("status") == "ok" and prev.get("seal") == item.seal and prev.get("out") == out
+                and all(prev.get(k) == v for k, v in self.inputs.items()) and os.path.exists(out)):
+            item.out, item.sha256, item.status = out, prev["sha256"], "skipped"
+            return False
+        item.out = out
+        item.plan = None  # fill reads the plan file itself; drop it to keep queued items small
+        return True
+
+    async def fill(self, item):
+        tmp = item.out + ".part"
+        cmd = [self.exe, "--pdf", self.template, "--plan", item.plan_path, "--out", tmp]
+        if self.sig:
+            cmd += ["--sig", self.sig]
+        proc = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        _, err = await proc.communicate()
+        if proc.returncode != 0:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise RuntimeError(f"pdf_export exited {proc.returncode}: {err.decode('utf-8', 'replace').strip()[-200:]}")
+        return True
+
+    async def archive(self, item):
+        tmp = item.out + ".part"
+        item.sha256 = await asyncio.to_thread(_sha256_file, tmp)
+        os.replace(tmp, item.out)
+        item.status = "ok"
+        return True
+
+    # MARK: - Plumbing
+
+    def _finish(self, item):
+        if item.status == "pending":
+            item.status = "ok"
+        self.results.append(item)
+        if self._ckpt and item.status != "skipped":
+            self._ckpt.write(json.dumps(dict(item.record(), **self.inputs), sort_keys=True) + "\n")
+            self._ckpt.flush()
+
+    async def _worker(self, name, fn, inbox, outbox):
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                await inbox.put(_DONE)  # let sibling workers see it too
+                return
+            try:
+                with span(f"export.{name}", plan=os.path.basename(item.plan_path)):
+                    forward = await fn(item)
+            except Exception as e:
+                item.status, item.stage, item.error = "failed", name, f"{type(e).__name__}: {e}"
+                forward = False
+            if forward and outbox is not None:
+                await outbox.put(item)
+            else:
+                self._finish(item)
+
+    async def run(self, plan_paths):
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.previous = load_checkpoint(self.checkpoint)
+        self.inputs = {"template": os.path.abspath(self.template),
+                       "template_sha256": await asyncio.to_thread(_sha256_file, self.template),
+                       "sig": os.path.abspath(self.sig) if self.sig else None,
+                       "sig_sha256": await asyncio.to_thread(_sha256_file, self.sig) if self.sig else None}
+        self._claimed = {rec["out"]: path for path, rec in self.previous.items()
+                         if rec.get("status") == "ok" and rec.get("out")}
+        stages = [("load", self.load), ("validate", self.validate), ("seal", self.seal),
+                  ("fill", self.fill), ("archive", self.archive)]
+        queues = [asyncio.Queue(self.queue_size) for _ in stages]
+        self._ckpt = open(self.checkpoint, "a", encoding="utf-8") if self.checkpoint else None
+        try:
+            groups = []
+            for i, (name, fn) in enumerate(stages):
+                outbox = queues[i + 1] if i + 1 < len(stages) else None
+                groups.append([asyncio.create_task(self._worker(name, fn, queues[i], outbox))
+                               for _ in range(max(1, self.limits[name]))])
+            for p in plan_paths:
+                await queues[0].put(Item(os.path.abspath(p)))
+            # Drain stage by stage: a stage is finished once all its workers have seen _DONE
+            for i, tasks in enumerate(groups):
+                await queues[i].put(_DONE)
+                await asyncio.gather(*tasks)
+        finally:
+            if self._ckpt:
+                self._ckpt.close()
+        return self.results
+
+def run(plan_paths, **kw):
+    return asyncio.run(ExportPipeline(**kw).run(plan_paths))
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Field overflow predictor for the PDF fill template (asm.py pdf.overflow).
+
+validation_rules.json's text_may_overflow advisory compares character
+counts against fixed thresholds; this measures instead. The template is
+read once: for every field in FORM_FIELD_MAP.json it takes the widget rect,
+the font and size from the field's default appearance, the multiline flag
+and MaxLen. Glyph-width tables are built once per font (from the font's
+/Widths, else the standard-14 metrics below) and word widths are memoized,
+so a batch of plans costs one template parse plus arithmetic per field.
+
+Text is laid out the way Acrobat lays out a widget: 2pt inset on each
+side, greedy word wrap at spaces (words wider than the box break between
+characters), explicit newlines honoured, line height from the font bbox.
+A field overflows when it needs more lines than fit (multiline), is wider
+than the box (single line) or exceeds MaxLen. Auto-sized fields (size 0)
+shrink from 12pt; they overflow when even MIN_AUTO_SIZE does not fit.
+
+Values come from plans exactly as valueForKey in tools/pdf_export/PDFExport.swift
+fills them.
+"""
+import datetime, json, os
+import pdf_form
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIELD_MAP = os.path.join(ROOT, "FORM_FIELD_MAP.json")
+INSET = 2.0
+AUTO_MAX_SIZE = 12.0
+MIN_AUTO_SIZE = 6.0
+WORD_CACHE_LIMIT = 50000
+
+# Standard-14 advance widths (1/1000 em) for WinAnsi codes 32-126, and font bbox height
+_STD = {
+    "Helvetica": (1.156, (
+        "278 278 355 556 556 889 667 191 333 333 389 584 278 333 278 278 556 556 556 556 556 556 556 556 556 556 "
+        "278 278 584 584 584 556 1015 667 667 722 722 667 611 778 722 278 500 667 556 833 722 778 667 778 722 667 "
+        "611 722 667 944 667 667 611 278 278 278 469 556 333 556 556 500 556 556 278 556 556 222 222 500 222 833 "
+        "556 556 556 556 333 500 278 556 500 722 500 500 500 334 260 334 584")),
+    "Helvetica-Bold": (1.190, (
+        "278 333 474 556 556 889 722 238 333 333 389 584 278 333 278 278 556 556 556 556 556 556 556 556 556 556 "
+        "333 333 584 584 584 611 975 722 722 722 722 667 611 778 722 278 556 722 611 833 722 778 667 778 722 667 "
+        "611 722 667 944 667 667 611 333 278 333 584 556 333 556 611 556 611 556 333 611 611 278 278 556 278 889 "
+        "611 611 611 611 389 556 333 611 556 778 556 556 500 389 280 389 584")),
+    "Times-Roman": (1.116, (
+        "250 333 408 500 500 833 778 180 333 333 500 564 250 333 250 278 500 500 500 500 500 500 500 500 500 500 "
+        "278 278 564 564 564 444 921 722 667 667 722 611 556 722 722 333 389 722 611 889 722 722 556 722 667 556 "
+        "611 722 722 944 722 722 611 333 278 333 469 500 333 444 500 444 500 444 333 500 500 278 278 500 278 778 "
+        "500 500 500 500 333 389 278 500 500 722 500 500 444 480 200 480 541")),
+    "Courier": (1.055, " ".join(["600"] * 95)),
+}
+
+_std_tables = {}
+
+def _std_name(base):
+    b = base.split("+")[-1].lower()  # drop subset prefix (ABCDEF+Arial)
+    if "courier" in b or "mono" in b:
+        return "Courier"
+    if "times" in b or ("serif" in b and "sans" not in b):
+        return "Times-Roman"
+    return "Helvetica-Bold" if "bold" in b else "Helvetica"
+
+class FontMetrics:
+    """Glyph widths for one font, indexed by WinAnsi code, plus a word-width memo."""
+    def __init__(self, name, widths, line_height):
+        self.name, self.widths, self.line_height = name, widths, line_height
+        self.space = widths[32]
+        self._words = {}
+
+    @classmethod
+    def standard(cls, name):
+        if name not in _std_tables:
+            lh, table = _STD[name]
+            ascii_widths = [float(w) for w in table.split()]
+            widths = [sum(ascii_widths) / len(ascii_widths)] * 256  # average for codes outside 32-126
+            widths[32:127] = ascii_widths
+            _std_tables[name] = (widths, lh)
+        widths, lh = _std_tables[name]
+        return cls(name, widths, lh)
+
+    @classmethod
+    def from_dict(cls, font, doc):
+        base = str(font.get("BaseFont") or "Helvetica")
+        std = cls.standard(_std_name(base))
+        widths = doc.get(font.get("Widths"))
+        if not widths:
+            return cls(base, std.widths, std.line_height)
+        desc = doc.get(font.get("FontDescriptor")) or {}
+        table = [float(desc.get("MissingWidth") or 0) or w for w in std.widths]
+        first = int(font.get("FirstChar", 0))
+        for i, w in enumerate(widths):
+            if 0 <= first + i < 256:
+                table[first + i] = float(doc.get(w))
+        bbox = doc.get(desc.get("FontBBox"))
+        lh = (float(bbox[3]) - float(bbox[1])) / 1000 if bbox and len(bbox) == 4 else std.line_height
+        return cls(base, table, lh or std.line_height)
+
+    def width(self, word):
+        """Advance width of word in 1/1000 em."""
+        w = self._words.get(word)
+        if w is None:
+            if len(self._words) >= WORD_CACHE_LIMIT:
+                self._words.clear()
+            widths = self.widths
+            w = self._words[word] = sum(widths[b] for b in word.encode("cp1252", "replace"))
+        return w
+
+    def line_count(self, text, limit):
+        """Lines needed for text wrapped at spaces into limit (1/1000 em units)."""
+        if not text:
+            return 0
+        lines = 0
+        for para in text.replace("\r\n", "\n").replace("\r", "\n").split("\n"):
+            lines += 1
+            line = None
+            for word in para.split(" "):
+                w = self.width(word)
+                if line is not None and line + self.space + w <= limit:
+                    line += self.space + w
+                    continue
+                if line is not None:
+                    lines += 1
+                if w <= limit:
+                    line = w
+                    continue
+                line = 0.0  # break inside the word
+                for ch in word:
+                    cw = self.width(ch)
+                    if line and line + cw > limit:
+                        lines += 1
+                        line = 0.0
+                    line += cw
+        return lines
+
+class Field:
+    __slots__ = ("name", "page", "width", "height", "font", "size", "multiline", "max_len")
+
+    def __init__(self, name, attrs, font):
+        x0, y0, x1, y1 = attrs["Rect"]
+        self.name, self.page, self.font = name, attrs.get("page"), font
+        self.width, self.height = abs(x1 - x0) - 2 * INSET, abs(y1 - y0) - 2 * INSET
+        self.size = pdf_form.default_appearance(attrs.get("DA"))[1]
+        self.multiline = bool(int(attrs.get("Ff") or 0) & pdf_form.FF_MULTILINE)
+        self.max_len = attrs.get("MaxLen")
+
+    def max_lines(self, size):
+        return max(int(self.height // (size * self.font.line_height)), 1) if self.multiline else 1
+
+    def _fits(self, text, size):
+        limit = self.width * 1000 / size
+        if self.multiline:
+            lines = self.font.line_count(text, limit)
+            return lines <= self.max_lines(size), lines
+        return self.font.width(text) <= limit, 1 if text else 0
+
+    def measure(self, text):
+        size = self.size
+        if size:
+            ok, lines = self._fits(text, size)
+        else:  # auto size: largest size (0.5pt steps) that fits, as viewers shrink to fit
+            size = AUTO_MAX_SIZE if self.multiline else max(min(AUTO_MAX_SIZE, self.height / self.font.line_height), 1.0)
+            while True:
+                ok, lines = self._fits(text, size)
+                if ok or size - 0.5 < MIN_AUTO_SIZE:
+                    break
+                size -= 0.5
+        if self.max_len is not None and len(text) > self.max_len:
+            ok = False
+        # Single-line fields overflow on width, so report it (pt) alongside the line counts
+        text_width = None if self.multiline else round(self.font.width(text) * size / 1000, 1)
+        return {"field": self.name, "page": self.page, "chars": len(text), "max_len": self.max_len, "lines": lines,
+                "max_lines": self.max_lines(size), "size": size, "multiline": self.multiline,
+                "text_width": text_width, "box_width": round(self.width, 1), "overflow": not ok}
+
+class Template:
+    """Layout of the mapped text fields of one template PDF."""
+    def __init__(self, path, field_names=None):
+        doc = pdf_form.Document.open(path)
+        fonts = doc.fonts()
+        self.path, self.fields, self.missing = path, {}, []
+        metrics = {}
+        for name, attrs in doc.text_fields():
+            if field_names is not None and name not in field_names:
+                continue
+            res, _ = pdf_form.default_appearance(attrs.get("DA"))
+            if res not in metrics:
+                font = fonts.get(res)
+                metrics[res] = FontMetrics.from_dict(font, doc) if font else FontMetrics.standard(_std_name(res or ""))
+            self.fields[name] = Field(name, attrs, metrics[res])
+        if field_names is not None:
+            self.missing = sorted(set(field_names) - set(self.fields))
+
+_templates = {}
+
+def load_template(path, field_names=None):
+    """Template layout, parsed once per (file, mtime, size, field set)."""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size, tuple(sorted(field_names or ())))
+    if key not in _templates:
+        _templates[key] = Template(path, field_names)
+    return _templates[key]
+
+def load_field_map(path=FIELD_MAP):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def field_value(key, plan, plan_date):
+    """Mirror of valueForKey in PDFExport.swift."""
+    if key in ("patientFullName", "mrn", "levelOfCare"):
+        return str(plan.get(key) or "")
+    if key == "initialPlanDate":  # DateFormatter .short, en_US
+        return f"{plan_date.month}/{plan_date.day}/{plan_date.year % 100:02d}"
+    if key.startswith("problem") and "_" in key:
+        n, attr = key[len("problem"):].split("_", 1)
+        problems = plan.get("problems")
+        problems = problems if isinstance(problems, list) else []
+        i = int(n) - 1 if n.isdigit() else -1
+        if 0 <= i < len(problems) and isinstance(problems[i], dict) and attr in ("statement", "goal"):
+            return str(problems[i].get(attr) or "")
+    return ""
+
+def predict(plan, template, field_map, plan_date=None):
+    """Measurement for every mapped field of one plan that the template has."""
+    plan_date = plan_date or datetime.date.today()
+    out = []
+    for name, key in field_map.items():
+        field = template.fields.get(name)
+        if field is not None:
+            out.append(dict(field.measure(field_value(key, plan, plan_date)), value_key=key))
+    return out
+
+def predict_batch(plan_paths, template_path, field_map=None):
+    """Yield (plan_path, plan_id, measurements, error) per plan; the template is parsed once.
+
+    A plan that cannot be read, is not a JSON object or cannot be measured
+    yields error (a string) and no measurements, and the batch continues.
+    """
+    field_map = field_map if field_map is not None else load_field_map()
+    template = load_template(template_path, field_map.keys())
+    today = datetime.date.today()
+    for path in plan_paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                plan = json.load(f)
+        except (OSError, ValueError) as e:
+            yield path, None, [], f"{type(e).__name__}: {e}"
+            continue
+        if not isinstance(plan, dict):
+            yield path, None, [], f"plan is a JSON {type(plan).__name__}, not an object"
+            continue
+        try:
+            results = predict(plan, template, field_map, today)
+        except Exception as e:  # one malformed plan must not end the batch
+            yield path, plan.get("id"), [], f"{type(e).__name__}: {e}"
+            continue
+        yield path, plan.get("id"), results, None
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Minimal read-only AcroForm reader (stdlib only).
+
+Reads what preflight checks need from a fill template without rendering
+it: every text field's full name, widget rect, page, default appearance
+(font resource and size), flags and MaxLen, plus the font dictionaries in
+the form's default resources.
+
+Handles classic and cross-reference-stream files, FlateDecode object
+streams and incremental updates (later definitions win). It does not
+decrypt; encrypted templates raise FormError.
+"""
+import re, zlib
+
+class FormError(Exception):
+    pass
+
+class Name(str):
+    pass
+
+class Ref(tuple):
+    pass
+
+FF_MULTILINE = 1 << 12
+
+_WS = b" \t\r\n\f\0"
+_DELIMS = b"()<>[]{}/%" + _WS
+_OBJ = re.compile(rb"(\d+)\s+(\d+)\s+obj\b")
+_REF = re.compile(rb"\s*(\d+)\s+R(?![^\s()<>\[\]{}/%])")
+_NUMBER = re.compile(rb"[+-]?(?:\d+\.?\d*|\.\d+)")
+_ESCAPES = {ord("n"): b"\n", ord("r"): b"\r", ord("t"): b"\t", ord("b"): b"\b", ord("f"): b"\f"}
+_DA_FONT = re.compile(r"/([^\s/]+)\s+([\d.]+)\s+Tf")
+
+class _Parser:
+    def __init__(self, data, pos=0):
+        self.data, self.pos = data, pos
+
+    def skip(self):
+        data, n = self.data, len(self.data)
+        while self.pos < n:
+            c = data[self.pos]
+            if c in _WS:
+                self.pos += 1
+            elif c == 0x25:  # % comment
+                end = data.find(b"\n", self.pos)
+                self.pos = n if end < 0 else end + 1
+            else:
+                break
+
+    def parse(self):
+        self.skip()
+        data, pos = self.data, self.pos
+        c = data[pos:pos + 1]
+        if data.startswith(b"<<", pos):
+            self.pos += 2
+            d = {}
+            while True:
+                self.skip()
+                if self.data.startswith(b">>", self.pos):
+                    self.pos += 2
+                    return d
+                key = self.parse()
+                d[key] = self.parse()
+        if c == b"[":
+            self.pos += 1
+            arr = []
+            while True:
+                self.skip()
+                if self.data[self.pos:self.pos + 1] == b"]":
+                    self.pos += 1
+                    return arr
+                arr.append(self.parse())
+        if c == b"/":
+            end = pos + 1
+            while end < len(data) and data[end] not in _DELIMS:
+                end += 1
+            self.pos = end
+            raw = re.sub(rb"#([0-9A-Fa-f]{2})", lambda m: bytes([int(m.group(1), 16)]), data[pos + 1:end])
+            return Name(raw.decode("latin-1"))
+        if c == b"(":
+            return self._literal()
+        if c == b"<":
+            end = data.index(b">", pos)
+            self.pos = end + 1
+            hexs = re.sub(rb"\s", b"", data[pos + 1:end])
+            return bytes.fromhex((hexs + b"0" * (len(hexs) % 2)).decode("ascii"))
+        m = _NUMBER.match(data, pos)
+        if m:
+            self.pos = m.end()
+            if b"." not in m.group():
+                r = _REF.match(data, self.pos)
+                if r:
+                    self.pos = r.end()
+                    return Ref((int(m.group()), int(r.group(1))))
+                return int(m.group())
+            return float(m.group())
+        for word, value in ((b"true", True), (b"false", False), (b"null", None)):
+            if data.startswith(word, pos):
+                self.pos += len(word)
+                return value
+        raise FormError(f"unexpected token at byte {pos}: {data[pos:pos + 20]!r}")
+
+    def _literal(self):
+        data, i, depth, out = self.data, self.pos + 1, 1, bytearray()
+        while True:
+            c = data[i]
+            if c == 0x5C:  # backslash
+                i += 1
+                e = data[i]
+                if e in _ESCAPES:
+                    out += _ESCAPES[e]
+                elif 0x30 <= e <= 0x37:
+                    j = i
+                    while j < i + 3 and 0x30 <= data[j] <= 0x37:
+                        j += 1
+                    out.append(int(data[i:j], 8) & 0xFF)
+                    i = j - 1
+                elif e in b"\r\n":  # line continuation
+                    if e == 0x0D and data[i + 1:i + 2] == b"\n":
+                        i += 1
+                else:
+                    out.append(e)
+            elif c == 0x28:
+                depth += 1
+                out.append(c)
+            elif c == 0x29:
+                depth -= 1
+                if depth == 0:
+                    self.pos = i + 1
+                    return bytes(out)
+                out.append(c)
+            else:
+                out.append(c)
+            i += 1
+
+def text(value):
+    """Decode a PDF text string (PDFDocEncoding or UTF-16BE with BOM)."""
+    if isinstance(value, bytes):
+        if value.startswith(b"\xfe\xff"):
+            return value[2:].decode("utf-16-be", "replace")
+        return value.decode("latin-1")
+    return str(value or "")
+
+class Document:
+    def __init__(self, data):
+        self.data = data
+        self.objects = {}
+        self.trailer = {}
+        self._scan()
+
+    @classmethod
+    def open(cls, path):
+        with open(path, "rb") as f:
+            return cls(f.read())
+
+    def _stream(self, d, p):
+        """Raw stream bytes following dict d; p.pos is just past the dict."""
+        data = self.data
+        start = data.find(b"stream", p.pos)
+        start += 6
+        if data[start:start + 2] == b"\r\n":
+            start += 2
+        elif data[start:start + 1] in (b"\n", b"\r"):
+            start += 1
+        length = d.get("Length")
+        end = start + length if isinstance(length, int) else -1
+        if end < 0 or data.find(b"endstream", end, end + 32) < 0:
+            end = data.index(b"endstream", start)  # indirect or wrong /Length
+        p.pos = end
+        raw = data[start:end]
+        filters = d.get("Filter")
+        filters = filters if isinstance(filters, list) else [filters] if filters else []
+        if filters == ["FlateDecode"]:
+            return zlib.decompress(raw)
+        return raw if not filters else None
+
+    def _scan(self):
+        data, pos = self.data, 0
+        while True:
+            m = _OBJ.search(data, pos)
+            if not m:
+                break
+            p = _Parser(data, m.end())
+            try:
+                obj = p.parse()
+            except (FormError, IndexError, ValueError):
+                pos = m.end()
+                continue
+            p.skip()
+            if isinstance(obj, dict) and data.startswith(b"stream", p.pos):
+                try:
+                    body = self._stream(obj, p)
+                except (ValueError, zlib.error):
+                    body = None
+                if obj.get("Type") == "ObjStm" and body is not None:
+                    self._object_stream(obj, body)
+                elif obj.get("Type") == "XRef":
+                    self.trailer.update(obj)
+            self.objects[(int(m.group(1)), int(m.group(2)))] = obj
+            pos = p.pos
+        for m in re.finditer(rb"trailer\s*<<", data):
+            try:
+                self.trailer.update(_Parser(data, m.end() - 2).parse())
+            except (FormError, IndexError, ValueError):
+                pass
+        if "Encrypt" in self.trailer:
+            raise FormError("encrypted templates are not supported")
+        if "Root" not in self.trailer:
+            raise FormError("no document catalog found")
+
+    def _object_stream(self, d, body):
+        n, first = d.get("N", 0), d.get("First", 0)
+        header = body[:first].split()
+        for i in range(min(n, len(header) // 2)):
+            num, off = int(header[2 * i]), int(header[2 * i + 1])
+            try:
+                self.objects[(num, 0)] = _Parser(body, first + off).parse()
+            except (FormError, IndexError, ValueError):
+                continue
+
+    def get(self, x):
+        seen = 0
+        while isinstance(x, Ref) and seen < 32:
+            x, seen = self.objects.get(x), seen + 1
+        return x
+
+    @property
+    def catalog(self):
+        return self.get(self.trailer["Root"]) or {}
+
+    def _annotation_pages(self):
+        pages, stack = {}, [self.catalog.get("Pages")]
+        index = 0
+        while stack:
+            node = self.get(stack.pop())
+            if not isinstance(node, dict):
+                continue
+            if "Kids" in node:
+                stack.extend(reversed(self.get(node["Kids"]) or []))
+                continue
+            for a in self.get(node.get("Annots")) or []:
+                if isinstance(a, Ref):
+                    pages[a] = index
+            index += 1
+        return pages
+
+    def text_fields(self):
+        """(full_name, attrs) for every text field widget, attrs holding the inherited DA/Ff/MaxLen/Q."""
+        form = self.get(self.catalog.get("AcroForm")) or {}
+        pages = self._annotation_pages()
+        root = {"DA": form.get("DA", ""), "Ff": 0, "Q": form.get("Q", 0)}
+        out, stack = [], [(f, "", root) for f in reversed(self.get(form.get("Fields")) or [])]
+        while stack:
+            ref, prefix, inherited = stack.pop()
+            node = self.get(ref)
+            if not isinstance(node, dict):
+                continue
+            name = prefix
+            if "T" in node:
+                name = f"{prefix}.{text(node['T'])}" if prefix else text(node["T"])
+            attrs = dict(inherited)
+            for k in ("FT", "Ff", "DA", "Q", "MaxLen"):
+                if k in node:
+                    attrs[k] = self.get(node[k])
+            kids = self.get(node.get("Kids")) or []
+            widgets = [k for k in kids if "T" not in (self.get(k) or {})]
+            stack.extend((k, name, attrs) for k in reversed(kids) if k not in widgets)
+            if attrs.get("FT") != "Tx" or not name:
+                continue
+            widget, wref = (self.get(widgets[0]), widgets[0]) if widgets else (node, ref)
+            if "Rect" not in widget:
+                continue
+            if "DA" in widget:
+                attrs["DA"] = widget["DA"]
+            attrs["Rect"] = [float(v) for v in self.get(widget["Rect"])]
+            attrs["page"] = pages.get(wref)
+            out.append((name, attrs))
+        return out
+
+    def fonts(self):
+        """Font resource name -> font dictionary from the form's default resources."""
+        form = self.get(self.catalog.get("AcroForm")) or {}
+        dr = self.get(form.get("DR")) or {}
+        return {k: self.get(v) or {} for k, v in (self.get(dr.get("Font")) or {}).items()}
+
+def default_appearance(da):
+    """(font resource name, size) from a DA string such as '/Helv 10 Tf 0 g'; size 0 means auto."""
+    m = _DA_FONT.search(text(da))
+    return (m.group(1), float(m.group(2))) if m else (None, 0.0)
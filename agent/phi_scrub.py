@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Streaming PHI de-identification for patient and assessment records.
+
+Records shaped like data/test_patients.json are scrubbed in two layers:
+
+1. Field-path rules. Paths are dotted keys with "*" standing for any list
+   index (e.g. "visit_history.*.fin"). A rule on an object or list covers
+   its whole subtree: redact replaces it, other actions apply to every
+   value inside (a more specific rule below it still wins). Actions:
+       pseudonym  keyed HMAC-SHA256 token, stable across runs and processes
+       name       same as pseudonym, tagged NAME
+       year       keep only the year of a date
+       redact     replace with "[REDACTED]"
+       drop       remove the key
+       keep       pass through untouched
+2. Every other string is treated as free text and run through precompiled
+   patterns (email, phone, SSN, dates, street addresses, titled names),
+   plus the record's own identifiers collected from layer 1, so a name
+   that also appears in "notes" gets the same token.
+
+Input is NDJSON or a JSON file holding a list (or {"test_patients": [...]});
+output is NDJSON. Records are processed in fixed-size batches across a
+process pool, so memory stays bounded regardless of input size. A JSON file
+(not NDJSON) has to be parsed whole before streaming starts.
+
+The pseudonym key comes from $PHI_SCRUB_KEY or --key-file. There is no
+default key: without one, tokens could be reversed by hashing guesses.
+"""
+import hashlib, hmac, itertools, json, os, re
+from multiprocessing import Pool
+
+KEY_ENV = "PHI_SCRUB_KEY"
+REDACTED = "[REDACTED]"
+
+DEFAULT_RULES = {
+    "mrn": "pseudonym",
+    "fin_current": "pseudonym",
+    "demographics.first_name": "name",
+    "demographics.last_name": "name",
+    "demographics.dob": "year",
+    "demographics.address": "redact",
+    "demographics.phone": "redact",
+    "demographics.email": "redact",
+    "demographics.emergency_contact": "redact",
+    "insurance.member_id": "pseudonym",
+    "insurance.group_number": "pseudonym",
+    "visit_history.*.fin": "pseudonym",
+    "visit_history.*.date": "year",
+    "visit_history.*.provider": "name",
+    "visit_history.*.location": "keep",
+    "clinical.pregnancy.ob_provider": "name",
+    "clinical.substance_use.recovery_date": "year",
+}
+
+_TITLE = r"(?:Dr|Mr|Mrs|Ms|Miss)\.?"
+_TITLES = {"dr", "mr", "mrs", "ms", "miss"}
+_NAME = r"[A-Z][a-z]+(?:[-'][A-Z][a-z]+)?"
+PATTERNS = [
+    ("email", re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")),
+    ("ssn", re.compile(r"\b\d{3}-\d{2}-\d{4}\b")),
+    ("phone", re.compile(r"(?<![A-Za-z0-9])(?:\+?1[-. ]?)?\(?\d{3}\)?[-. ]?\d{3}[-. ]?\d{4}(?!\d)")),
+    ("address", re.compile(r"\b\d{1,6}\s+(?:[A-Z][a-z]+\s+){1,3}"
+                           r"(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Lane|Ln|Drive|Dr|Court|Ct|Way|Place|Pl)\b\.?"
+                           r"(?:,?\s+[A-Z][a-z]+(?:\s[A-Z][a-z]+)*,?\s+[A-Z]{2}\s+\d{5}(?:-\d{4})?)?")),
+    ("zip", re.compile(r"\b[A-Z]{2}\s+\d{5}(?:-\d{4})?\b")),
+    ("date", re.compile(r"\b(\d{4})-\d{2}-\d{2}\b|\b\d{1,2}/\d{1,2}/(\d{4})\b")),
+    ("titled_name", re.compile(rf"\b{_TITLE}\s+{_NAME}(?:\s+{_NAME})?")),
+    ("identifier", re.compile(r"\b(?:MRN|FIN)[:#\s]*[A-Z0-9-]{4,}\b")),
+]
+
+def load_key(key_file=None):
+    if key_file:
+        with open(key_file, "rb") as f:
+            key = f.read().strip()
+    else:
+        key = os.environ.get(KEY_ENV, "").encode("utf-8")
+    if not key:
+        raise ValueError(f"pseudonym key required: set ${KEY_ENV} or pass --key-file")
+    return key
+
+def load_rules(path=None):
+    if not path:
+        return dict(DEFAULT_RULES)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+class Scrubber:
+    def __init__(self, key, rules=None):
+        self.key = key
+        self.rules = DEFAULT_RULES if rules is None else rules
+
+    def token(self, value, tag="ID"):
+        norm = " ".join(str(value).split()).lower()
+        digest = hmac.new(self.key, f"{tag}:{norm}".encode("utf-8"), hashlib.sha256).hexdigest()[:12]
+        return f"{tag}-{digest}"
+
+    def _apply(self, action, value):
+        if value is None or action == "keep":
+            return value
+        if action == "pseudonym":
+            return self.token(value)
+        if action == "name":
+            return self.token(value, "NAME")
+        if action == "year":
+            m = re.search(r"\d{4}", str(value))
+            return m.group(0) if m else REDACTED
+        return REDACTED
+
+    def _known(self, rec):
+        """Original -> replacement for every ruled string in this record."""
+        known = {}
+        def walk(o, path, inherited):
+            action = self.rules.get(path) or inherited
+            if isinstance(o, dict):
+                for k, v in o.items():
+                    walk(v, f"{path}.{k}" if path else k, action)
+            elif isinstance(o, list):
+                for v in o:
+                    walk(v, f"{path}.*", action)
+            elif isinstance(o, str) and len(o) > 2 and action not in (None, "keep", "year"):
+                known[o] = self._apply(action, o)
+                if action == "name":
+                    # Name parts without titles or punctuation: "Dr. Sarah Chen" -> Sarah, Chen
+                    known.update((part, self.token(part, "NAME")) for part in re.findall(r"[A-Za-z][A-Za-z'-]+", o)
+                                 if len(part) > 2 and part.lower() not in _TITLES)
+        walk(rec, "", None)
+        return known
+
+    def free_text(self, s, known_rx=None, known=None):
+        if known_rx is not None:
+            s = known_rx.sub(lambda m: known[m.group(0)], s)
+        for kind, rx in PATTERNS:
+            if kind == "date":
+                s = rx.sub(lambda m: m.group(1) or m.group(2), s)
+            elif kind == "titled_name":
+                s = rx.sub(lambda m: self.token(m.group(0).split(None, 1)[1], "NAME"), s)
+            else:
+                s = rx.sub(f"[{kind.upper()}]", s)
+        return s
+
+    def scrub(self, rec):
+        known = self._known(rec)
+        known_rx = None
+        if known:
+            alternation = "|".join(re.escape(k) for k in sorted(known, key=len, reverse=True))
+            known_rx = re.compile(rf"(?<!\w)(?:{alternation})(?!\w)")  # whole words only: "Ann" must not hit "Annual"
+        def walk(o, path, inherited):
+            action = self.rules.get(path) or inherited
+            if isinstance(o, (dict, list)):
+                if action == "keep":
+                    return o
+                if action in ("redact", "drop"):
+                    return REDACTED
+            if isinstance(o, dict):
+                out = {}
+                for k, v in o.items():
+                    p = f"{path}.{k}" if path else k
+                    if self.rules.get(p) == "drop":
+                        continue
+                    out[k] = walk(v, p, action)
+                return out
+            if isinstance(o, list):
+                return [walk(v, f"{path}.*", action) for v in o]
+            if action is not None:
+                return self._apply(action, o)
+            if isinstance(o, str):
+                return self.free_text(o, known_rx, known)
+            return o
+        return walk(rec, "", None)
+
+def iter_records(path):
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".ndjson", ".jsonl")):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        obj = json.load(f)
+    if isinstance(obj, dict):
+        obj = obj.get("test_patients", obj.get("records", [obj]))
+    yield from obj
+
+_worker = None
+
+def _init_worker(key, rules):
+    global _worker
+    _worker = Scrubber(key, rules)
+
+def _scrub_line(rec):
+    return json.dumps(_worker.scrub(rec), ensure_ascii=False, sort_keys=True)
+
+def scrub_stream(records, out, key, rules=None, workers=None, batch=2000):
+    """Scrub an iterable of records into a text stream. Returns the record count."""
+    rules = DEFAULT_RULES if rules is None else rules
+    n = 0
+    if workers == 1:
+        _init_worker(key, rules)
+        for rec in records:
+            out.write(_scrub_line(rec) + "\n")
+            n += 1
+        return n
+    procs = workers or os.cpu_count() or 1
+    chunksize = max(1, batch // (4 * procs))
+    with Pool(procs, initializer=_init_worker, initargs=(key, rules)) as pool:
+        it = iter(records)
+        while True:
+            chunk = list(itertools.islice(it, batch))
+            if not chunk:
+                break
+            for line in pool.imap(_scrub_line, chunk, chunksize=chunksize):
+                out.write(line + "\n")
+            n += len(chunk)
+    return n
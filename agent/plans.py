@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""Plan JSON helpers shared by asm.py commands and the export pipeline."""
+import hashlib, json
+
+def canonical_bytes(obj) -> bytes:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+def plan_hash(plan) -> str:
+    return hashlib.sha256(canonical_bytes(plan)).hexdigest()
+
+def short_seal(digest: str) -> str:
+    """First 12 hex chars of a plan hash, used as the export seal."""
+    return digest[:12]
+
+def plan_errors(plan):
+    """Structural checks on a treatment plan; a plan with any error must not be exported.
+
+    validation_rules.json's tier "blocker" rules are written against the
+    assessment (domains, safety_flag, status), not against plan JSON, so
+    they are not evaluated here.
+    """
+    errs = []
+    if not plan.get("patientFullName"): errs.append("patientFullName is required")
+    if not plan.get("levelOfCare"): errs.append("levelOfCare is required")
+    if not isinstance(plan.get("problems", []), list): errs.append("problems must be a list")
+    return errs
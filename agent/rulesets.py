@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Multi-edition ruleset registry.
+
+A ruleset is any directory holding wm_ladder.json (plus loc_indication.guard.json
+and operators.json). Its identity is the edition/version declared in
+wm_ladder.json, so historical editions can sit side by side, e.g.
+
+    agent_ops/rules/                       current edition (rule sources)
+    ios/.../ASAMAssessment/rules/          the same edition as bundled in the app
+    agent_ops/rules/editions/asam3/0.9.0/  older edition kept for re-scoring
+
+Directories may declare the same edition/version only if the files the
+engine evaluates are identical. Each ruleset also gets the app's
+ruleset_hash, computed exactly as RulesChecksum.compute in
+ios/.../Services/RulesProvenance.swift: SHA-256 of "edition:v4\n" followed
+by the six CHECKSUM_FILES concatenated. A directory missing any of them
+(agent_ops/rules has no clinical_thresholds.json) has no ruleset_hash,
+just as the app would fail to compute one.
+
+Rulesets are compiled on first use and kept in an LRU with a memory
+budget. Each compiled ruleset's footprint is measured when it is built (the
+tracemalloc delta across compilation, so it counts the compiled structures,
+not the JSON on disk); max_compiled is a secondary cap on the entry count.
+Each
+assessment is routed to the ruleset it was signed under: "ruleset_hash"
+(full, or the 12-char "Rules" short form of the PDF footer) wins, then
+"rules_edition" + "rules_version", then the registry default.
+
+Evaluation semantics mirror ios/.../Services/RulesEngine.swift.
+"""
+import hashlib, json, os, threading
+from collections import OrderedDict
+from tracing import span
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_ROOTS = (os.path.join(ROOT, "agent_ops", "rules"), os.path.join(ROOT, "ios", "ASAMAssessment", "ASAMAssessment", "rules"))
+WM_FILE = "wm_ladder.json"
+LOC_FILE = "loc_indication.guard.json"
+OPERATORS_FILE = "operators.json"
+ENGINE_FILES = (WM_FILE, LOC_FILE, OPERATORS_FILE)
+CHECKSUM_FILES = ("anchors.json", WM_FILE, LOC_FILE, "validation_rules.json", OPERATORS_FILE, "clinical_thresholds.json")
+CHECKSUM_PREIMAGE = b"edition:v4\n"
+DEFAULT_BUDGET = 64 * 1024 * 1024
+DEFAULT_MAX_COMPILED = 64
+FALLBACK_LOC = {"indicated": "2.1", "why": ["fallback_default"], "rule_id": None}
+
+class RulesetError(Exception):
+    pass
+
+def _version_key(v):
+    return tuple(int(p) if p.isdigit() else p for p in str(v).replace("-", ".").split("."))
+
+class RulesetInfo:
+    """Discovered (not yet compiled) ruleset."""
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, WM_FILE), "r", encoding="utf-8") as f:
+            wm = json.load(f)
+        self.edition = wm.get("edition", "unknown")
+        self.version = str(wm.get("version", "0"))
+        data = {}
+        for name in set(ENGINE_FILES + CHECKSUM_FILES):
+            p = os.path.join(path, name)
+            if os.path.exists(p):
+                with open(p, "rb") as f:
+                    data[name] = f.read()
+        # Identity of what the engine evaluates; compiled rulesets are cached under it
+        h = hashlib.sha256()
+        for name in ENGINE_FILES:
+            h.update(name.encode("utf-8") + b"\0" + data.get(name, b""))
+        self.content_hash = h.hexdigest()
+        # The app's ruleset_hash (RulesChecksum.compute), or None if a file is missing
+        self.sha256 = None
+        if all(name in data for name in CHECKSUM_FILES):
+            self.sha256 = hashlib.sha256(CHECKSUM_PREIMAGE + b"".join(data[n] for n in CHECKSUM_FILES)).hexdigest()
+
+    @property
+    def key(self):
+        return f"{self.edition}@{self.version}"
+
+    def as_dict(self):
+        return {"edition": self.edition, "version": self.version, "sha256": self.sha256,
+                "content_hash": self.content_hash, "path": self.path}
+
+# MARK: - Compilation
+
+def _comparator(pred):
+    for op in ("<=", ">=", "==", "<", ">"):
+        if pred.startswith(op):
+            try:
+                rhs = float(pred[len(op):])
+            except ValueError:
+                return None
+            return {
+                "<=": lambda x: x <= rhs, ">=": lambda x: x >= rhs, "==": lambda x: x == rhs,
+                "<": lambda x: x < rhs, ">": lambda x: x > rhs,
+            }[op]
+    return None
+
+def _number(v):
+    if isinstance(v, bool):
+        return float(v)
+    if isinstance(v, (int, float)):
+        return float(v)
+    if isinstance(v, str):
+        try:
+            return float(v)
+        except ValueError:
+            return None
+    return None
+
+def _compile_condition(key, val):
+    if key == "wm_candidate" and isinstance(val, list):
+        pos = [str(v) for v in val if not str(v).startswith("!")]
+        neg = [str(v)[1:] for v in val if str(v).startswith("!")]
+        def check(state):
+            have = {str(v) for v in state.get("wm_candidate") or []}
+            return all(p in have for p in pos) and not any(n in have for n in neg)
+        return check
+    if isinstance(val, str):
+        cmp = _comparator(val)
+        if cmp is not None:
+            def check(state):
+                n = _number(state.get(key))
+                return n is not None and cmp(n)
+            return check
+        return lambda state: isinstance(state.get(key), str) and state.get(key) == val
+    if isinstance(val, bool):
+        return lambda state: isinstance(state.get(key), bool) and state.get(key) == val
+    return lambda state: False  # unknown type: fail safe
+
+def _compile_rules(rules, rank_key):
+    compiled = []
+    for r in rules:
+        rank = r.get(rank_key)
+        if not isinstance(rank, int) or not isinstance(r.get("if"), dict):
+            continue
+        preds = [_compile_condition(k, v) for k, v in r["if"].items()]
+        compiled.append((rank, preds, r.get("then") or {}, r.get("rule_id")))
+    # Stable sort keeps file order among equal ranks, matching the Swift "strictly greater" scan
+    compiled.sort(key=lambda c: -c[0])
+    return compiled
+
+def _first_match(compiled, state, touched=None):
+    for rank, preds, then, rule_id in compiled:
+        if touched is not None:
+            touched.append((rule_id, rank))
+        if all(p(state) for p in preds):
+            return then, rule_id
+    return None, None
+
+def _rules_of(obj):
+    return obj.get("rules", []) if isinstance(obj, dict) else (obj or [])
+
+def _measured(build):
+    """(result of build(), bytes it still holds), via tracemalloc around the call."""
+    import tracemalloc
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        obj = build()
+        return obj, max(tracemalloc.get_traced_memory()[0] - before, 0)
+    finally:
+        if started:
+            tracemalloc.stop()
+
+class CompiledRuleset:
+    def __init__(self, info):
+        self.info = info
+        self.size = 0  # bytes held, set by RulesetRegistry.get when measured
+        for name in (WM_FILE, LOC_FILE, OPERATORS_FILE):
+            self.reload(name)
+
+    def reload(self, name):
+        """(Re)compile one rule file of this ruleset in place."""
+        path = os.path.join(self.info.path, name)
+        if name == OPERATORS_FILE:
+            self.operators = {}
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    self.operators = json.load(f)
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            obj = json.load(f)
+        if name == WM_FILE:
+            self.wm = _compile_rules(_rules_of(obj), "priority")
+        elif name == LOC_FILE:
+            self.loc = _compile_rules(_rules_of(obj), "precedence")
+            fb = obj.get("fallback") if isinstance(obj, dict) else None
+            self.fallback = {"indicated": fb["indicated_loc"], "why": fb.get("why", []), "rule_id": None} if fb else FALLBACK_LOC
+
+    def evaluate(self, state, touched=None):
+        """Evaluate WM then LOC. If touched is a dict, it receives {file: [(rule_id, rank), ...]} examined."""
+        wm_seen = loc_seen = None
+        if touched is not None:
+            wm_seen = touched.setdefault(WM_FILE, [])
+            loc_seen = touched.setdefault(LOC_FILE, [])
+        then, rule_id = _first_match(self.wm, state, wm_seen)
+        wm = {
+            "indicated": bool(then and then.get("wm_indicated")),
+            "candidate_levels": list(then.get("candidate_levels", [])) if then else [],
+            "rule_id": rule_id,
+        }
+        state_plus = dict(state, wm_candidate=wm["candidate_levels"]) if wm["indicated"] else state
+        then, rule_id = _first_match(self.loc, state_plus, loc_seen)
+        loc = {"indicated": then.get("indicated_loc", "2.1"), "why": then.get("why", []), "rule_id": rule_id} if then else dict(self.fallback)
+        return {"ruleset": self.info.key, "ruleset_hash": self.info.sha256, "wm": wm, "loc": loc}
+
+def build_state(assessment):
+    """Flatten an assessment/fixture input the same way RulesService.evaluate does."""
+    src = assessment.get("input", assessment)
+    state = dict(src.get("severities") or {})
+    d1 = src.get("d1") or {}
+    for k in ("substances", "cows", "ciwa"):
+        if k in d1:
+            state[k] = d1[k]
+    state.update(src.get("flags") or {})
+    state.update(src.get("program") or {})
+    return state
+
+# MARK: - Registry
+
+class RulesetRegistry:
+    def __init__(self, roots=DEFAULT_ROOTS, budget_bytes=DEFAULT_BUDGET, max_compiled=DEFAULT_MAX_COMPILED, default=None):
+        self.budget = budget_bytes
+        self.max_compiled = max(1, max_compiled)
+        self.by_hash, self.by_key = {}, {}
+        self._cache = OrderedDict()  # content_hash -> CompiledRuleset
+        self._lock = threading.Lock()
+        # One compile at a time, so a tracemalloc delta is not inflated by a concurrent compile
+        self._compile_lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0}
+        for root in roots:
+            self._discover(root)
+        if not self.by_key:
+            raise RulesetError(f"no rulesets found under: {', '.join(roots)}")
+        self.default = default or max(self.by_key, key=lambda k: _version_key(self.by_key[k].version))
+
+    def _discover(self, root):
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            if WM_FILE not in filenames or LOC_FILE not in filenames:
+                continue
+            info = RulesetInfo(dirpath)
+            other = self.by_key.get(info.key)
+            if other is not None and other.content_hash != info.content_hash:
+                raise RulesetError(f"{info.key} declared by {other.path} and {info.path} with different rules")
+            if other is None or (other.sha256 is None and info.sha256 is not None):
+                self.by_key[info.key] = info
+            if info.sha256:
+                self.by_hash.setdefault(info.sha256, info)
+
+    def rulesets(self):
+        return sorted(self.by_key.values(), key=lambda i: (i.edition, _version_key(i.version)))
+
+    def resolve(self, assessment=None):
+        """Pick the RulesetInfo pinned on an assessment (or the default)."""
+        a = assessment or {}
+        pin = a.get("ruleset_hash")
+        if pin:
+            pin = str(pin).lower()
+            matches = {i.content_hash: i for h, i in self.by_hash.items() if h.startswith(pin)}
+            if len(matches) != 1:
+                raise RulesetError(f"ruleset_hash {pin} matches {len(matches)} rulesets"
+                                   + (" (only directories with all of CHECKSUM_FILES have one)" if not matches else ""))
+            return next(iter(matches.values()))
+        if a.get("rules_version"):
+            key = f"{a.get('rules_edition', self.by_key[self.default].edition)}@{a['rules_version']}"
+            if key not in self.by_key:
+                raise RulesetError(f"ruleset {key} not found")
+            return self.by_key[key]
+        return self.by_key[self.default]
+
+    def get(self, info):
+        with self._lock:
+            rs = self._cache.get(info.content_hash)
+            if rs is not None:
+                self._cache.move_to_end(info.content_hash)
+                self.stats["hits"] += 1
+                return rs
+            self.stats["misses"] += 1
+        with self._compile_lock, span("rules.compile", ruleset=info.key) as s:
+            rs, size = _measured(lambda: CompiledRuleset(info))
+            rs.size = size
+            s.set(bytes=size)
+        with self._lock:
+            if info.content_hash not in self._cache:
+                self._cache[info.content_hash] = rs
+                self.stats["bytes"] += rs.size
+                # Always keep the entry just inserted, even if it alone exceeds the budget
+                while len(self._cache) > 1 and (self.stats["bytes"] > self.budget or len(self._cache) > self.max_compiled):
+                    _, old = self._cache.popitem(last=False)
+                    self.stats["bytes"] -= old.size
+                    self.stats["evictions"] += 1
+            return self._cache[info.content_hash]
+
+    def evaluate(self, assessment):
+        return self.get(self.resolve(assessment)).evaluate(build_state(assessment))
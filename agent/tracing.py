@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Lightweight span tracing for asm.py.
+
+    from tracing import span
+    with span("plan.load", path=infile):
+        ...
+
+Spans nest per thread/task and record wall-clock duration plus attributes.
+Tracing is off unless configured, in which case span() is a shared no-op:
+
+    ASM_TRACE=out/trace.jsonl        one JSON object per finished span
+    ASM_TRACE=out/trace.json         Chrome trace format (chrome://tracing, Perfetto)
+    ASM_TRACE_FORMAT=jsonl|chrome    override the extension-based choice
+    ASM_TRACE_SAMPLE=0.1             keep ~10% of root spans (default 1.0)
+
+asm.py also accepts --trace PATH / --trace-sample RATE before the subcommand.
+Sampling is decided once per root span; children follow their root.
+
+Only the modules span() needs when tracing is off are imported at module
+load; the rest are imported by Tracer, since every asm.py command pays for
+this module's imports.
+"""
+import contextvars, itertools, os, time
+
+_current = contextvars.ContextVar("asm_span", default=None)
+_ids = itertools.count(1)
+_tracer = None
+FORMATS = ("jsonl", "chrome")
+
+class TracingError(ValueError):
+    pass
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return False
+    def set(self, **attrs):
+        pass
+
+NOOP = _NoopSpan()
+
+class Span:
+    __slots__ = ("tracer", "name", "attrs", "id", "parent", "sampled", "start", "dur", "tid", "_token")
+
+    def __init__(self, tracer, name, attrs):
+        parent = _current.get()
+        self.tracer, self.name, self.attrs = tracer, name, attrs
+        self.id = next(_ids)
+        self.parent = parent.id if parent else None
+        self.sampled = parent.sampled if parent else tracer.sample()
+        self.tid = tracer.get_ident()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.dur = time.perf_counter() - self.start
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        if self.sampled:
+            self.tracer.record(self)
+        return False
+
+class Tracer:
+    def __init__(self, path, fmt=None, sample_rate=1.0):
+        import atexit, random, threading
+        self.path = path
+        self.fmt = fmt or ("chrome" if path.endswith(".json") else "jsonl")
+        self.rate = sample_rate
+        self.t0 = time.perf_counter()
+        self.wall0 = time.time()
+        self.events = []
+        self.lock = threading.Lock()
+        self.get_ident = threading.get_ident
+        self.random = random.random
+        d = os.path.dirname(os.path.abspath(path))
+        os.makedirs(d, exist_ok=True)
+        atexit.register(self.flush)
+
+    def sample(self):
+        return self.rate >= 1.0 or self.random() < self.rate
+
+    def record(self, s):
+        with self.lock:
+            self.events.append(s)
+
+    def flush(self):
+        import json
+        with self.lock:
+            if self.fmt == "chrome":
+                # Rewritten whole on each flush; Chrome's JSON document is not appendable
+                events = list(self.events)
+            else:
+                events, self.events = self.events, []
+        if not events:
+            return
+        pid = os.getpid()
+        if self.fmt == "chrome":
+            trace = {"traceEvents": [{
+                "name": s.name, "ph": "X", "pid": pid, "tid": s.tid,
+                "ts": round((s.start - self.t0) * 1e6, 1), "dur": round(s.dur * 1e6, 1),
+                "args": dict(s.attrs, span_id=s.id, parent_id=s.parent),
+            } for s in sorted(events, key=lambda s: s.start)], "displayTimeUnit": "ms"}
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(trace, f, default=str)  # an unserializable attribute must not lose the trace
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            for s in events:
+                f.write(json.dumps({
+                    "name": s.name, "span_id": s.id, "parent_id": s.parent, "pid": pid, "tid": s.tid,
+                    "start": round(self.wall0 + (s.start - self.t0), 6), "duration_ms": round(s.dur * 1000, 3),
+                    "attrs": s.attrs,
+                }, default=str) + "\n")
+
+def configure(path=None, fmt=None, sample_rate=None):
+    """Enable tracing from arguments, falling back to ASM_TRACE* environment variables."""
+    global _tracer
+    path = path or os.environ.get("ASM_TRACE")
+    if not path:
+        return None
+    fmt = fmt or os.environ.get("ASM_TRACE_FORMAT")
+    if fmt and fmt not in FORMATS:
+        raise TracingError(f"trace format must be one of {', '.join(FORMATS)}, got {fmt!r}")
+    if sample_rate is None:
+        raw = os.environ.get("ASM_TRACE_SAMPLE", "1.0")
+        try:
+            sample_rate = float(raw)
+        except ValueError:
+            raise TracingError(f"ASM_TRACE_SAMPLE must be a number between 0 and 1, got {raw!r}") from None
+    if not 0.0 <= sample_rate <= 1.0:
+        raise TracingError(f"trace sample rate must be between 0 and 1, got {sample_rate:g}")
+    _tracer = Tracer(path, fmt, sample_rate)
+    return _tracer
+
+def enabled():
+    return _tracer is not None
+
+def span(name, **attrs):
+    if _tracer is None:
+        return NOOP
+    return Span(_tracer, name, attrs)
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Watch mode for rule and questionnaire authors (asm.py watch).
+
+Polls agent_ops/rules/, questionnaires/ and the fixture directories. The
+first pass runs every fixture and records what each one touched:
+
+    rule fixtures (agent_ops/tests/fixtures/case_*.json)
+        the WM/LOC rule ids examined before the first match, and the rank
+        (priority/precedence) of that match
+    questionnaire fixtures (tests/fixtures/qa_case_*.json)
+        the (domain, question id) pairs answered
+
+On a change only the modified file is recompiled and diffed rule-by-rule
+(or question-by-question). A rule fixture re-runs only if a changed rule
+was examined by it or now ranks at or above its previous match, i.e. could
+change its outcome. Questionnaire fixtures re-run only if a question they
+answered changed. Edited fixtures re-run themselves. Lint checks run for
+the file that changed: JSON syntax, duplicate question ids, and the crumb
+linter for validation_rules.json / crumbs.yml.
+
+If wm_ladder.json or loc_indication.guard.json is deleted or renamed, the
+rule fixtures are reported as unevaluable (rather than keeping results
+from the stale compiled rules) until it is back, and then all re-run.
+
+The LOC engine (and the app) read loc_indication.guard.json only. Edits to
+loc_indication.json get the JSON syntax check and a note that they have no
+effect; no fixtures re-run for them.
+"""
+import glob, hashlib, json, os, subprocess, sys, time
+import rulesets
+
+ROOT = rulesets.ROOT
+RULES_DIR = os.path.join(ROOT, "agent_ops", "rules")
+QUESTIONNAIRE_DIR = os.path.join(ROOT, "questionnaires")
+FIXTURE_DIRS = (os.path.join(ROOT, "agent_ops", "tests", "fixtures"), os.path.join(ROOT, "tests", "fixtures"))
+CRUMB_LINTER = os.path.join(ROOT, "agent_ops", "tools", "crumb_linter.py")
+CRUMB_INPUTS = ("validation_rules.json", "crumbs.yml")
+RANK_KEYS = {rulesets.WM_FILE: "priority", rulesets.LOC_FILE: "precedence"}
+UNREAD_RULE_FILES = {"loc_indication.json": rulesets.LOC_FILE}  # file -> the one the engine reads instead
+NO_MATCH = float("-inf")
+UNEVALUABLE = "unevaluable"
+FALLBACK_ID = "__fallback__"
+
+def _digest(obj):
+    return hashlib.sha1(json.dumps(obj, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _load_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _rule_digests(obj, rank_key):
+    """rule_id -> (rank, digest) for one rule file."""
+    out = {}
+    for i, r in enumerate(rulesets._rules_of(obj)):
+        out[r.get("rule_id", f"#{i}")] = (r.get(rank_key, NO_MATCH), _digest(r))
+    if isinstance(obj, dict) and "fallback" in obj:
+        out[FALLBACK_ID] = (NO_MATCH, _digest(obj["fallback"]))
+    return out
+
+def _diff(old, new):
+    """rule_id -> ranks (old and new) of every added, removed or modified entry."""
+    changed = {}
+    for rid in old.keys() | new.keys():
+        a, b = old.get(rid), new.get(rid)
+        if a is None or b is None or a[1] != b[1]:
+            changed[rid] = [x[0] for x in (a, b) if x is not None]
+    return changed
+
+def _question_digests(obj):
+    return {q.get("id"): _digest(q) for q in obj.get("questions", [])}
+
+def lint_questionnaire(obj):
+    errs, seen = [], set()
+    for q in obj.get("questions", []):
+        qid = q.get("id")
+        if not qid:
+            errs.append("question without id")
+        elif qid in seen:
+            errs.append(f"duplicate question id {qid}")
+        seen.add(qid)
+        values = [o.get("value") for o in q.get("options", []) if isinstance(o, dict)]
+        if len(values) != len(set(values)):
+            errs.append(f"{qid}: duplicate option values")
+    return errs
+
+def _snapshot(dirs):
+    snap = {}
+    for d, recursive in dirs:
+        pattern = os.path.join(d, "**", "*") if recursive else os.path.join(d, "*")
+        for p in glob.glob(pattern, recursive=recursive):
+            if p.endswith((".json", ".yml")):
+                try:
+                    st = os.stat(p)
+                except FileNotFoundError:
+                    continue
+                snap[p] = (st.st_mtime_ns, st.st_size)
+    return snap
+
+class Watcher:
+    def __init__(self, rules_dir=RULES_DIR, questionnaire_dir=QUESTIONNAIRE_DIR, fixture_dirs=FIXTURE_DIRS, out=print):
+        self.rules_dir, self.questionnaire_dir, self.fixture_dirs = rules_dir, questionnaire_dir, fixture_dirs
+        self.out = out
+        self.ruleset = rulesets.CompiledRuleset(rulesets.RulesetInfo(rules_dir))
+        self.rule_digests = {name: _rule_digests(_load_json(os.path.join(rules_dir, name)), key)
+                             for name, key in RANK_KEYS.items()}
+        self.missing = set()   # RANK_KEYS files deleted since they were compiled
+        self.domains = {}      # path -> domain letter
+        self.questions = {}    # domain -> {qid: question}
+        self.q_digests = {}    # domain -> {qid: digest}
+        for p in glob.glob(os.path.join(questionnaire_dir, "domains", "*.json")):
+            self._load_questionnaire(p)
+        self.deps = {}         # fixture path -> dependency record from its last run
+        self.results = {}      # fixture path -> (ok, detail)
+        self.dirs = [(rules_dir, False), (questionnaire_dir, True)] + [(d, True) for d in fixture_dirs]
+        self.snap = _snapshot(self.dirs)
+
+    # MARK: - Fixtures
+
+    def fixtures(self):
+        return sorted(p for d in self.fixture_dirs for p in glob.glob(os.path.join(d, "*.json")))
+
+    def run_fixture(self, path):
+        try:
+            fx = _load_json(path)
+        except (OSError, ValueError) as e:
+            self.deps.pop(path, None)
+            return self._record(path, False, f"unreadable: {e}")
+        if "domain_answers" in fx:
+            return self._run_questionnaire_fixture(path, fx)
+        if "expected" in fx:
+            return self._run_rule_fixture(path, fx)
+        self.deps.pop(path, None)
+        return None
+
+    def _record(self, path, ok, detail=""):
+        self.results[path] = (ok, detail)
+        return ok
+
+    def _run_rule_fixture(self, path, fx):
+        if self.missing:
+            # Keep the old deps so the fixture re-runs when the file is back
+            return self._record(path, False, f"{UNEVALUABLE}: {', '.join(sorted(self.missing))} removed")
+        touched = {}
+        res = self.ruleset.evaluate(rulesets.build_state(fx), touched)
+        deps = {}
+        for name, outcome in ((rulesets.WM_FILE, res["wm"]), (rulesets.LOC_FILE, res["loc"])):
+            seen = touched.get(name, [])
+            matched = outcome.get("rule_id") is not None and seen
+            deps[name] = ({rid for rid, _ in seen}, seen[-1][1] if matched else NO_MATCH)
+        self.deps[path] = {"rules": deps}
+        exp, errs = fx["expected"], []
+        if "wm" in exp and "indicated" in exp["wm"] and exp["wm"]["indicated"] != res["wm"]["indicated"]:
+            errs.append(f"wm.indicated {res['wm']['indicated']} != {exp['wm']['indicated']}")
+        if "loc" in exp and "indicated" in exp["loc"] and exp["loc"]["indicated"] != res["loc"]["indicated"]:
+            errs.append(f"loc {res['loc']['indicated']} != {exp['loc']['indicated']}")
+        return self._record(path, not errs, "; ".join(errs))
+
+    def _run_questionnaire_fixture(self, path, fx):
+        touched, errs = set(), []
+        for domain, answers in (fx.get("domain_answers") or {}).items():
+            questions = self.questions.get(domain, {})
+            for qid, value in (answers or {}).items():
+                touched.add((domain, qid))
+                q = questions.get(qid)
+                if q is None:
+                    errs.append(f"{domain}.{qid}: no such question")
+                    continue
+                allowed = {o.get("value") for o in q.get("options", []) if isinstance(o, dict)}
+                if allowed:
+                    bad = [v for v in (value if isinstance(value, list) else [value]) if v not in allowed]
+                    if bad:
+                        errs.append(f"{domain}.{qid}: invalid option {bad}")
+        self.deps[path] = {"questions": touched}
+        return self._record(path, not errs, "; ".join(errs))
+
+    # MARK: - Change handling
+
+    def _load_questionnaire(self, path):
+        obj = _load_json(path)
+        domain = obj.get("domain")
+        self.domains[path] = domain
+        self.questions[domain] = {q.get("id"): q for q in obj.get("questions", [])}
+        old = self.q_digests.get(domain, {})
+        new = self.q_digests[domain] = _question_digests(obj)
+        return domain, {qid for qid in old.keys() | new.keys() if old.get(qid) != new.get(qid)}, lint_questionnaire(obj)
+
+    def _rules_changed(self, name):
+        """Recompile one rule file; return fixtures whose outcome it could change."""
+        obj = _load_json(os.path.join(self.rules_dir, name))
+        new = _rule_digests(obj, RANK_KEYS[name])
+        changed = _diff(self.rule_digests[name], new)
+        self.ruleset.reload(name)
+        self.rule_digests[name] = new
+        affected = set()
+        for fx, dep in self.deps.items():
+            if name not in dep.get("rules", {}):
+                continue
+            seen, cutoff = dep["rules"][name]
+            if any(rid in seen or max(ranks) >= cutoff for rid, ranks in changed.items()):
+                affected.add(fx)
+        return changed, affected
+
+    def _rule_fixtures(self):
+        return {fx for fx, dep in self.deps.items() if "rules" in dep}
+
+    def _crumb_lint(self):
+        r = subprocess.run([sys.executable, CRUMB_LINTER], cwd=ROOT, capture_output=True, text=True)
+        lines = [l for l in r.stdout.splitlines() if l.strip()]
+        return r.returncode == 0, (lines[-1] if lines else r.stderr.strip())
+
+    def handle(self, changed_paths):
+        """Process one batch of changed files. Returns a list of report lines."""
+        report, rerun = [], set()
+        for p in sorted(changed_paths):
+            rel = os.path.relpath(p, ROOT)
+            exists = os.path.exists(p)
+            if os.path.dirname(p) == self.rules_dir:
+                name = os.path.basename(p)
+                if not exists:
+                    report.append(f"- {rel}: removed")
+                    if name in RANK_KEYS:
+                        self.missing.add(name)
+                        rerun |= self._rule_fixtures()
+                if name.endswith(".json") and exists:
+                    try:
+                        _load_json(p)
+                    except ValueError as e:
+                        report.append(f"✗ {rel}: invalid JSON: {e}")
+                        continue
+                if name in RANK_KEYS and exists:
+                    restored = name in self.missing
+                    self.missing.discard(name)
+                    changed, affected = self._rules_changed(name)
+                    if restored:
+                        affected = self._rule_fixtures()  # every rule fixture was left unevaluated
+                    report.append(f"↻ {rel}: {'restored' if restored else 'recompiled'}, {len(changed)} rule(s) changed "
+                                  f"→ {len(affected)} fixture(s)")
+                    rerun |= affected
+                if name in UNREAD_RULE_FILES and exists:
+                    report.append(f"· {rel}: not read by the engine (edit {UNREAD_RULE_FILES[name]}); no fixtures re-run")
+                if name in CRUMB_INPUTS:
+                    ok, msg = self._crumb_lint()
+                    report.append(f"{'✓' if ok else '✗'} crumb lint: {msg}")
+            elif p.startswith(self.questionnaire_dir):
+                if not exists or os.path.basename(os.path.dirname(p)) != "domains":
+                    continue
+                try:
+                    domain, changed, errs = self._load_questionnaire(p)
+                except ValueError as e:
+                    report.append(f"✗ {rel}: invalid JSON: {e}")
+                    continue
+                for e in errs:
+                    report.append(f"✗ {rel}: {e}")
+                affected = {fx for fx, dep in self.deps.items()
+                            if any((domain, q) in dep.get("questions", ()) for q in changed)}
+                report.append(f"↻ {rel}: {len(changed)} question(s) changed → {len(affected)} fixture(s)")
+                rerun |= affected
+            elif exists:
+                rerun.add(p)
+            else:
+                self.deps.pop(p, None)
+                self.results.pop(p, None)
+                report.append(f"- {rel}: removed")
+        for fx in sorted(rerun):
+            ok = self.run_fixture(fx)
+            if ok is False:
+                detail = self.results[fx][1]
+                report.append(f"{'?' if detail.startswith(UNEVALUABLE) else '✗'} {os.path.relpath(fx, ROOT)}: {detail}")
+        if rerun:
+            failed = sum(1 for fx in rerun if self.results.get(fx, (True,))[0] is False)
+            skipped = sum(1 for fx in rerun if self.results.get(fx, (True, ""))[1].startswith(UNEVALUABLE))
+            report.append(f"ran {len(rerun)}/{len(self.deps)} fixture(s): {len(rerun) - failed} pass, {failed - skipped} fail"
+                          + (f", {skipped} {UNEVALUABLE}" if skipped else ""))
+        return report
+
+    def run_all(self):
+        return self.handle(set(self.fixtures()))
+
+    def poll(self):
+        snap = _snapshot(self.dirs)
+        changed = {p for p in snap.keys() | self.snap.keys() if snap.get(p) != self.snap.get(p)}
+        self.snap = snap
+        return changed
+
+    def loop(self, interval=0.2):
+        t0 = time.perf_counter()
+        for line in self.run_all():
+            self.out(line)
+        self.out(f"watching ({(time.perf_counter() - t0) * 1000:.0f} ms initial run); Ctrl-C to stop")
+        while True:
+            time.sleep(interval)
+            changed = self.poll()
+            if not changed:
+                continue
+            t0 = time.perf_counter()
+            for line in self.handle(changed):
+                self.out(line)
+            self.out(f"[{time.strftime('%H:%M:%S')}] done in {(time.perf_counter() - t0) * 1000:.0f} ms")
@@ -1,18 +1,10 @@
 #!/usr/bin/env python3
-import json, sys, argparse, datetime, os, subprocess
+import sys, argparse, datetime, os, subprocess
+from task_journal import TaskJournal
 
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 DOCS = os.path.join(ROOT, "docs")
 
-def load_index():
-    with open(os.path.join(DOCS, "TODO_INDEX.json"), "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def save_index(idx):
-    idx["updated_at"] = datetime.datetime.now().isoformat()
-    with open(os.path.join(DOCS, "TODO_INDEX.json"), "w", encoding="utf-8") as f:
-        json.dump(idx, f, indent=2)
-
 def render_master(idx):
     lines = []
     lines.append("# MASTER_TODO")
@@ -30,8 +22,10 @@ def render_master(idx):
     for t in idx["tasks"]:
         mark = " " if t["status"]!="done" else "x"
         lines.append(f"- [{mark}] {t['id']}  {t['title']} ({t['priority']})")
-    with open(os.path.join(DOCS, "MASTER_TODO.md"), "w", encoding="utf-8") as f:
+    tmp = os.path.join(DOCS, "MASTER_TODO.md.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
         f.write("\n".join(lines))
+    os.replace(tmp, os.path.join(DOCS, "MASTER_TODO.md"))
 
 def append_run_log(args):
     log_path = os.path.join(DOCS, "RUN_LOG.md")
@@ -59,16 +53,14 @@ def main():
     ap.add_argument("--summary", default="")
     ap.add_argument("--completed", nargs="*", default=[])
     ap.add_argument("--artifacts", nargs="*", default=[])
+    ap.add_argument("--compact", action="store_true", help="fold the task journal into TODO_INDEX.json now")
     args = ap.parse_args()
 
-    idx = load_index()
-    idset = set(args.completed)
-    for t in idx["tasks"]:
-        if t["id"] in idset:
-            t["status"] = "done"
-    save_index(idx)
-    render_master(idx)
-    append_run_log(args)
+    journal = TaskJournal(DOCS, on_snapshot=render_master)
+    journal.append([{"task": t, "status": "done", "run_id": args.run_id, "actor": args.actor} for t in args.completed])
+    with journal.locked():
+        append_run_log(args)
+    journal.compact(force=args.compact)
     check_root()
     print("Post-run updates complete.")
 if __name__ == "__main__":
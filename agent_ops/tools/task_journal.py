@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Append-only task journal behind docs/TODO_INDEX.json.
+
+Agents record task status changes as JSON lines in docs/TODO_JOURNAL.ndjson
+under an exclusive file lock, so concurrent runs never lose updates.
+TODO_INDEX.json is a snapshot: it stores the journal byte offset it
+has absorbed ("journal_offset") and a digest of its tasks. Compaction folds
+the journal tail into the snapshot once enough events accumulate (or on
+demand); MASTER_TODO.md is re-rendered only when the digest changes.
+
+Reads never replay the full history: state() is the snapshot plus the
+events after its offset.
+
+Usage:
+    python3 tools/task_journal.py status [TASK_ID ...]
+    python3 tools/task_journal.py compact
+"""
+import argparse, contextlib, datetime, hashlib, json, os, sys
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DOCS = os.path.join(ROOT, "docs")
+COMPACT_EVERY = 50
+
+def tasks_digest(tasks):
+    return hashlib.sha256(json.dumps(tasks, sort_keys=True).encode("utf-8")).hexdigest()
+
+def apply_events(tasks, events):
+    by_id = {t["id"]: t for t in tasks}
+    for e in events:
+        t = by_id.get(e.get("task"))
+        if t is not None and "status" in e:
+            t["status"] = e["status"]
+    return tasks
+
+class TaskJournal:
+    def __init__(self, docs=DOCS, compact_every=COMPACT_EVERY, on_snapshot=None):
+        self.index_path = os.path.join(docs, "TODO_INDEX.json")
+        self.journal_path = os.path.join(docs, "TODO_JOURNAL.ndjson")
+        self.lock_path = os.path.join(docs, ".TODO_INDEX.lock")
+        self.compact_every = compact_every
+        self.on_snapshot = on_snapshot
+
+    @contextlib.contextmanager
+    def locked(self):
+        """Exclusive lock shared by every writer of the journal, index and run log."""
+        with open(self.lock_path, "a+") as f:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def load_snapshot(self):
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _tail(self, offset):
+        """Events after byte offset, and the offset just past the last complete line."""
+        events = []
+        if not os.path.exists(self.journal_path):
+            return events, 0
+        with open(self.journal_path, "rb") as f:
+            if offset > os.fstat(f.fileno()).st_size:
+                offset = 0  # journal was replaced; replaying from the start is idempotent
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partially written by a concurrent appender
+                offset += len(line)
+                if line.strip():
+                    events.append(json.loads(line))
+        return events, offset
+
+    def append(self, events):
+        if not events:
+            return
+        now = datetime.datetime.now().isoformat()
+        data = "".join(json.dumps(dict({"ts": now}, **e), sort_keys=True) + "\n" for e in events)
+        with self.locked():
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def state(self):
+        snap = self.load_snapshot()
+        events, _ = self._tail(snap.get("journal_offset", 0))
+        snap["tasks"] = apply_events(snap["tasks"], events)
+        snap["pending_events"] = len(events)
+        return snap
+
+    def task(self, task_id):
+        return next((t for t in self.state()["tasks"] if t["id"] == task_id), None)
+
+    def compact(self, force=False):
+        """Fold the journal tail into the snapshot. Returns True if the tasks changed."""
+        with self.locked():
+            snap = self.load_snapshot()
+            events, end = self._tail(snap.get("journal_offset", 0))
+            if not events or (not force and len(events) < self.compact_every):
+                return False
+            before = snap.get("tasks_digest") or tasks_digest(snap["tasks"])
+            snap["tasks"] = apply_events(snap["tasks"], events)
+            digest = tasks_digest(snap["tasks"])
+            changed = digest != before
+            if changed:
+                snap["updated_at"] = datetime.datetime.now().isoformat()
+            snap["tasks_digest"] = digest
+            snap["journal_offset"] = end
+            tmp = self.index_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(snap, f, indent=2)
+            os.replace(tmp, self.index_path)
+            if changed and self.on_snapshot:
+                self.on_snapshot(snap)
+            return changed
+
+def main():
+    ap = argparse.ArgumentParser()
+    sp = ap.add_subparsers(dest="cmd")
+    p = sp.add_parser("status"); p.add_argument("ids", nargs="*")
+    sp.add_parser("compact")
+    args = ap.parse_args()
+    journal = TaskJournal()
+    if args.cmd == "status":
+        st = journal.state()
+        for t in st["tasks"]:
+            if not args.ids or t["id"] in args.ids:
+                print(f"{t['id']}  {t['status']:<6} {t['priority']}  {t['title']}")
+        print(f"({st['pending_events']} journal events not yet compacted)")
+    elif args.cmd == "compact":
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from agent_postrun import render_master
+        journal.on_snapshot = render_master
+        print("Snapshot updated." if journal.compact(force=True) else "No task changes.")
+    else:
+        ap.print_help(); sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Behavioral checks for agent/analytics.py (asm.py analytics).
+
+Builds reports from records in both shapes the agent sees (flat assessment
+results and fixtures wrapped in "input") and checks the LOC confusion
+matrix, discrepancy reasons (list or single string), severities and WM
+rates. The pure-Python fallback must agree with numpy when numpy is present.
+
+Exit codes:
+  0 = OK
+  1 = A check failed
+"""
+import json, os, sys, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "agent"))
+import analytics
+
+RECORDS = [
+    # Fixture shape: everything under "input", expectations alongside
+    {"input": {"severities": {"A": 1, "B": 2}, "loc": {"indicated": "2.1", "actual": "3.1", "discrepancy_reasons": []}},
+     "expected": {"wm": {"indicated": True}}},
+    {"input": {"loc": {"indicated": "2.1", "actual": "3.1", "discrepancy_reasons": ["bed availability"]},
+               "wm": {"indicated": True}}},
+    # Flat shape, with a single free-text reason
+    {"indicated_loc": "2.1", "actual_loc": "1.0", "discrepancy_reasons": "patient preference", "wm_indicated": False,
+     "severities": {"A": 4}},
+    {"indicated_loc": "3.1", "actual_loc": "3.1", "domains": [{"number": 1, "severity": 3}]},
+]
+
+def report(records):
+    with tempfile.TemporaryDirectory() as tmp:
+        p = os.path.join(tmp, "records.ndjson")
+        with open(p, "w") as f:
+            f.write("\n".join(json.dumps(r) for r in records) + "\n")
+        return analytics.build_report(analytics.load_columns([p], loc_codes=()))
+
+def main():
+    results = []
+    def check(label, ok, detail=""):
+        results.append(ok)
+        print(f"{'✅' if ok else '❌'} {label}" + (f": {detail}" if not ok and detail else ""))
+
+    rep = report(RECORDS)
+    cm = rep["loc_confusion"]
+    cell = lambda i, a: cm["matrix"][cm["labels"].index(i)][cm["labels"].index(a)] if {i, a} <= set(cm["labels"]) else None
+    check("wrapped input LOCs reach the confusion matrix", cell("2.1", "3.1") == 2, str(cm))
+    check("flat LOCs reach the confusion matrix", cell("2.1", "1.0") == 1 and cell("3.1", "3.1") == 1, str(cm))
+    check("no record lands in the (missing) row", analytics.MISSING not in cm["labels"], str(cm))
+    disc = rep["discrepancy"]
+    check("discrepancies counted across both shapes", disc["discrepant"] == 3 and disc["missing_reason"] == 1, str(disc))
+    check("a string reason counts as one reason",
+          disc["reasons"] == {"bed availability": 1, "patient preference": 1}, str(disc["reasons"]))
+    sev = rep["severity_distribution"]
+    check("severities read from input, flat and domains",
+          sev["A"]["1"] == 1 and sev["A"]["4"] == 1 and sev["A"]["3"] == 1 and sev["B"]["2"] == 1, str(sev["A"]))
+    wm = rep["wm"]["overall"]
+    check("WM read from input, never from expected", wm == {"assessed": 2, "indicated": 1, "rate": 0.5}, str(wm))
+
+    fixtures = analytics.build_report(analytics.load_columns([os.path.join(ROOT, "agent_ops", "tests", "fixtures")]))
+    check("fixtures: case_012 discrepancy without reason found",
+          fixtures["discrepancy"]["discrepant"] >= 1 and fixtures["discrepancy"]["missing_reason"] >= 1,
+          str(fixtures["discrepancy"]))
+
+    if analytics.np is not None:
+        analytics.np = None
+        check("pure-Python fallback matches numpy", report(RECORDS) == rep)
+
+    if not all(results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
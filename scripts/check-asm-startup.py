@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Startup-time budget for agent/asm.py.
+
+Integration scripts call asm.py in tight shell loops, so cold start of the
+trivial commands is held to a budget: the median wall time of each command,
+minus the median of a bare `python -c pass`, must stay under BUDGET_MS. Each
+command must also not import any module in HEAVY (checked with
+-X importtime), which catches an eager import before it shows up as time.
+
+Exit codes:
+  0 = OK
+  1 = Over budget or heavy module imported
+Env:
+  ASM_STARTUP_BUDGET_MS=25   allowed overhead over bare interpreter start
+  ASM_STARTUP_RUNS=15        runs per command (median is compared)
+"""
+import os, statistics, subprocess, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASM = os.path.join(ROOT, "agent", "asm.py")
+BUDGET_MS = float(os.environ.get("ASM_STARTUP_BUDGET_MS", "25"))
+RUNS = int(os.environ.get("ASM_STARTUP_RUNS", "15"))
+COMMANDS = (["rand.id"], ["scaffold"])
+HEAVY = {"argparse", "json", "re", "hashlib", "subprocess", "asyncio", "multiprocessing", "secrets", "random",
+         "plans", "analytics", "phi_scrub", "rulesets", "watch", "export_pipeline", "overflow", "pdf_form",
+         "emr_context", "concurrent.futures", "http.server", "urllib.request"}
+
+def median_ms(cmd, cwd):
+    env = dict(os.environ)
+    for k in ("ASM_TRACE", "ASM_PROFILE_IMPORTS"):
+        env.pop(k, None)
+    times = []
+    for _ in range(RUNS):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, cwd=cwd, env=env, stdout=subprocess.DEVNULL, check=True)
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times)
+
+def imported(cmd, cwd):
+    r = subprocess.run([sys.executable, "-X", "importtime"] + cmd, cwd=cwd,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    return {line.rsplit("|", 1)[-1].strip() for line in r.stderr.splitlines() if line.startswith("import time:")}
+
+def main():
+    failed = False
+    with tempfile.TemporaryDirectory() as cwd:  # scaffold writes ./out
+        base = median_ms([sys.executable, "-c", "pass"], cwd)
+        print(f"interpreter baseline: {base:.1f} ms (median of {RUNS})")
+        for args in COMMANDS:
+            name = " ".join(args)
+            overhead = median_ms([sys.executable, ASM] + args, cwd) - base
+            heavy = sorted(imported([ASM] + args, cwd) & HEAVY)
+            ok = overhead <= BUDGET_MS and not heavy
+            failed |= not ok
+            print(f"{'✅' if ok else '❌'} asm.py {name}: +{overhead:.1f} ms (budget {BUDGET_MS:.0f} ms)")
+            if heavy:
+                print(f"   imports heavy module(s): {', '.join(heavy)}")
+    if failed:
+        print("Run `python3 agent/asm.py --profile-imports <command>` to see where the time goes.")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
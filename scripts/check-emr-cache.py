@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Behavioral checks for agent/emr_context.py (asm.py emr.get).
+
+Drives EMRContextCache with a fake clock and a scripted backend and checks
+request coalescing, per-kind TTL, refresh-ahead, LRU eviction, age_hours
+against the injected clock, and that neither a closed cache nor a backend
+raising BaseException leaves a request or waiter hanging.
+
+Exit codes:
+  0 = OK
+  1 = A check failed
+"""
+import os, sys, threading, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "agent"))
+import emr_context
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+class Backend:
+    """Counts fetches; a fetch blocks while gate is clear, then returns or raises `fail`."""
+    def __init__(self):
+        self.calls, self.fail = 0, None
+        self.gate = threading.Event()
+        self.gate.set()
+        self._lock = threading.Lock()
+
+    def fetch(self, kind, value):
+        with self._lock:
+            self.calls += 1
+            n = self.calls
+        self.gate.wait(5)
+        if self.fail:
+            raise self.fail
+        return {kind: value, "n": n}
+
+def wait_for(cond, timeout=2.0):
+    end = time.time() + timeout
+    while not cond() and time.time() < end:
+        time.sleep(0.005)
+    return cond()
+
+def main():
+    results = []
+    def check(label, ok, detail=""):
+        results.append(ok)
+        print(f"{'✅' if ok else '❌'} {label}" + (f": {detail}" if not ok and detail else ""))
+
+    clock, backend = Clock(), Backend()
+    with emr_context.EMRContextCache(backend, ttl={"mrn": 100, "fin": 10}, max_entries=2, refresh_ahead=0.2, clock=clock) as cache:
+        backend.gate.clear()
+        got = []
+        threads = [threading.Thread(target=lambda: got.append(cache.get(mrn="M1")), daemon=True) for _ in range(8)]
+        for t in threads:
+            t.start()
+        wait_for(lambda: cache.metrics()["coalesced"] == 7)
+        backend.gate.set()
+        for t in threads:
+            t.join(5)
+        check("concurrent misses share one fetch", backend.calls == 1 and len(got) == 8 and len({id(s) for s in got}) == 1,
+              f"calls={backend.calls} {cache.metrics()}")
+
+        clock.now += 50
+        check("hit within TTL", cache.get(mrn="M1").data["n"] == 1 and backend.calls == 1)
+        check("age_hours follows the cache clock", abs(cache.get(mrn="M1").age_hours - 50 / 3600) < 1e-9,
+              str(cache.get(mrn="M1").age_hours))
+
+        clock.now += 35  # 85s of a 100s TTL: inside the refresh window
+        snap = cache.get(mrn="M1")
+        check("refresh-ahead serves the old snapshot", snap.data["n"] == 1)
+        check("refresh-ahead refetches in the background",
+              wait_for(lambda: cache.get(mrn="M1").data["n"] == 2) and cache.metrics()["refreshes"] == 1, str(cache.metrics()))
+
+        cache.get(fin="F1")
+        clock.now += 11
+        calls = backend.calls
+        check("fin TTL is separate and shorter", cache.get(fin="F1").data["n"] == calls + 1)
+
+        cache.get(mrn="M2")
+        check("LRU evicts beyond max_entries", cache.metrics()["size"] == 2 and cache.metrics()["evictions"] >= 1,
+              str(cache.metrics()))
+
+    # Refresh-window hit after close: no refresh, nothing left in flight
+    clock2 = Clock()
+    cache = emr_context.EMRContextCache(Backend(), ttl={"mrn": 100}, clock=clock2)
+    cache.get(mrn="M1")
+    cache.close()
+    clock2.now += 90
+    try:
+        snap = cache.get(mrn="M1")
+        m = cache.metrics()
+        check("closed cache serves a refresh-window hit", snap.data["n"] == 1 and m["inflight"] == 0 and m["refreshes"] == 0, str(m))
+    except RuntimeError as e:
+        check("closed cache serves a refresh-window hit", False, str(e))
+
+    # Leader killed by a BaseException: coalesced waiters get an error instead of hanging
+    backend = Backend()
+    backend.gate.clear()
+    backend.fail = KeyboardInterrupt()
+    cache = emr_context.EMRContextCache(backend)
+    outcome = {}
+    def leader():
+        try:
+            cache.get(mrn="M1")
+        except BaseException as e:
+            outcome["leader"] = type(e).__name__
+    def waiter():
+        try:
+            cache.get(mrn="M1")
+        except emr_context.EMRError as e:
+            outcome["waiter"] = str(e)
+    t1 = threading.Thread(target=leader, daemon=True)
+    t1.start()
+    wait_for(lambda: cache.metrics()["inflight"] == 1)
+    t2 = threading.Thread(target=waiter, daemon=True)
+    t2.start()
+    wait_for(lambda: cache.metrics()["coalesced"] == 1)
+    backend.gate.set()
+    t1.join(2); t2.join(2)
+    check("BaseException in the leader reaches it and releases waiters",
+          outcome.get("leader") == "KeyboardInterrupt" and "waiter" in outcome and cache.metrics()["inflight"] == 0,
+          str(outcome))
+    cache.close()
+
+    if not all(results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
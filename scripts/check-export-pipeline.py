@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Behavioral checks for agent/export_pipeline.py (asm.py pdf.batch).
+
+Runs the pipeline against a stand-in pdf_export that logs each call and
+fails on request, and checks that a failing or blocked plan does not stop
+the batch, that output names stay inside out_dir and never collide, and
+that a rerun skips finished plans and re-exports changed ones, and all of
+them once the template or signature image changes.
+
+Exit codes:
+  0 = OK
+  1 = A check failed
+"""
+import json, os, sys, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "agent"))
+import export_pipeline
+
+# Writes a fake PDF from the plan, or exits 3 if the plan asks it to
+FAKE_EXE = """#!{python}
+import json, sys
+a = dict(zip(sys.argv[1::2], sys.argv[2::2]))
+with open({log!r}, "a") as f:
+    f.write(a["--plan"] + "\\n")
+plan = json.load(open(a["--plan"]))
+if plan.get("fail_export"):
+    sys.stderr.write("boom\\n")
+    sys.exit(3)
+open(a["--out"], "w").write("%PDF " + json.dumps(plan))
+"""
+
+def main():
+    results = []
+    def check(label, ok, detail=""):
+        results.append(ok)
+        print(f"{'✅' if ok else '❌'} {label}" + (f": {detail}" if not ok and detail else ""))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log = os.path.join(tmp, "calls.log")
+        exe = os.path.join(tmp, "pdf_export")
+        with open(exe, "w") as f:
+            f.write(FAKE_EXE.format(python=sys.executable, log=log))
+        os.chmod(exe, 0o755)
+        plans_dir = os.path.join(tmp, "plans")
+        os.makedirs(plans_dir)
+        def plan(name, **fields):
+            p = os.path.join(plans_dir, f"{name}.json")
+            with open(p, "w") as f:
+                json.dump(dict({"patientFullName": "Test Patient", "levelOfCare": "2.1", "problems": []}, **fields), f)
+            return p
+        paths = [plan("a", id="P-A"), plan("b", id="P-B"), plan("fails", id="P-F", fail_export=True),
+                 plan("blocked", id="P-X", levelOfCare=""), plan("dup", id="P-A"), plan("escape", id="../../escape")]
+        out_dir = os.path.join(tmp, "out")
+        ckpt = os.path.join(tmp, "ckpt.ndjson")
+        template, sig = os.path.join(tmp, "template.pdf"), os.path.join(tmp, "sig.png")
+        for p, data in ((template, "%PDF template v1"), (sig, "signature v1")):
+            with open(p, "w") as f:
+                f.write(data)
+        kw = dict(exe=exe, template=template, out_dir=out_dir, checkpoint=ckpt)
+        def calls():
+            with open(log) as f:
+                return [os.path.basename(line.strip()) for line in f]
+
+        by_name = {os.path.basename(r.plan_path): r for r in export_pipeline.run(paths, **kw)}
+        status = {n: r.status for n, r in by_name.items()}
+        check("every plan finishes", len(by_name) == len(paths), str(status))
+        check("good plans export despite a failing and a blocked one",
+              status.get("a.json") == status.get("b.json") == "ok", str(status))
+        check("fill failure is isolated to its plan",
+              status.get("fails.json") == "failed" and by_name["fails.json"].stage == "fill", str(status))
+        check("blocked plan is not exported", status.get("blocked.json") == "blocked", str(status))
+        check("duplicate id fails instead of overwriting",
+              status.get("dup.json") == "failed" and by_name["dup.json"].stage == "seal", str(status))
+        escaped = by_name["escape.json"].out or ""
+        check("path-like id stays inside out_dir",
+              status.get("escape.json") == "ok" and os.path.dirname(escaped) == out_dir, escaped)
+        check("every output file is written", all(os.path.exists(r.out) for r in by_name.values() if r.status == "ok"))
+        with open(by_name["a.json"].out) as f:
+            check("output is not clobbered by the duplicate", "fail_export" not in f.read() and calls().count("dup.json") == 0)
+
+        before = len(calls())
+        plan("b", id="P-B", levelOfCare="3.1")
+        status = {os.path.basename(r.plan_path): r.status for r in export_pipeline.run(paths, **kw)}
+        rerun = calls()[before:]
+        check("rerun skips plans already exported", status.get("a.json") == status.get("escape.json") == "skipped", str(status))
+        check("rerun re-exports a changed plan", status.get("b.json") == "ok" and "b.json" in rerun, str(rerun))
+        check("rerun retries the failed plan only", sorted(rerun) == ["b.json", "fails.json"], str(rerun))
+
+        exported = sorted(n for n, st in status.items() if st in ("ok", "skipped"))
+        def rerun_after(label, path, **extra):
+            with open(path, "a") as f:
+                f.write(" changed")
+            before = len(calls())
+            status = {os.path.basename(r.plan_path): r.status for r in export_pipeline.run(paths, **dict(kw, **extra))}
+            check(f"rerun after the {label} changes re-exports every plan",
+                  all(status[n] == "ok" for n in exported) and set(exported) <= set(calls()[before:]), str(status))
+        rerun_after("template", template)
+        export_pipeline.run(paths, **dict(kw, sig=sig))
+        status = {os.path.basename(r.plan_path): r.status for r in export_pipeline.run(paths, **dict(kw, sig=sig))}
+        check("rerun with the same signature image skips", all(status[n] == "skipped" for n in exported), str(status))
+        rerun_after("signature image", sig, sig=sig)
+
+        other = os.path.join(tmp, "other")
+        os.makedirs(other)
+        stray = os.path.join(other, "a.json")
+        with open(stray, "w") as f:
+            json.dump({"id": "P-A", "patientFullName": "Other", "levelOfCare": "1"}, f)
+        res = export_pipeline.run([stray], **kw)
+        check("a new plan cannot overwrite an earlier run's output", res[0].status == "failed", res[0].status)
+
+    if not all(results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
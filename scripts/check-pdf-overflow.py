@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Behavioral checks for agent/pdf_form.py and agent/overflow.py (asm.py pdf.overflow).
+
+Writes a tiny AcroForm twice, once with a classic xref table and once with
+its objects in a FlateDecode object stream behind a cross-reference
+stream, and checks that both parse to the same fields and that overflow
+predictions are exact for Courier (600/1000 em per glyph): single-line
+width, multiline wrap, MaxLen and auto size. Also checks that malformed
+plans are reported per plan without ending the batch, and that a file
+that is not a form raises FormError.
+
+Exit codes:
+  0 = OK
+  1 = A check failed
+"""
+import json, os, subprocess, sys, tempfile, zlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "agent"))
+import overflow, pdf_form
+
+# Courier at 10pt is 6pt per glyph; boxes are sized in glyphs plus the 2pt inset on each side
+CHAR = 6.0
+LH = 1.055 * 10  # Courier bbox line height at 10pt
+
+def _rect(x, y, chars, height):
+    return f"[{x} {y} {x + chars * CHAR + 4} {y + height + 4}]"
+
+OBJECTS = {
+    1: "<< /Type /Catalog /Pages 2 0 R /AcroForm 4 0 R >>",
+    2: "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+    3: "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Annots [10 0 R 11 0 R 12 0 R 13 0 R] >>",
+    4: "<< /Fields [10 0 R 11 0 R 12 0 R 13 0 R] /DA (/Cour 10 Tf 0 g) /DR << /Font << /Cour 5 0 R >> >> >>",
+    5: "<< /Type /Font /Subtype /Type1 /BaseFont /Courier >>",
+    # name: one line of exactly 10 glyphs
+    10: f"<< /FT /Tx /T (name) /Type /Annot /Subtype /Widget /Rect {_rect(50, 700, 10, 12)} >>",
+    # notes: 10 glyphs wide, 3 lines high, multiline
+    11: f"<< /FT /Tx /T (notes) /Ff 4096 /Type /Annot /Subtype /Widget /Rect {_rect(50, 600, 10, 3 * LH + 1)} >>",
+    # code: wide box, MaxLen 8
+    12: f"<< /FT /Tx /T (code) /MaxLen 8 /Type /Annot /Subtype /Widget /Rect {_rect(50, 500, 30, 12)} >>",
+    # level: auto size, 5 glyphs wide at 12pt
+    13: f"<< /FT /Tx /T (level) /DA (/Cour 0 Tf 0 g) /Type /Annot /Subtype /Widget /Rect [50 400 {50 + 5 * 7.2 + 4} {400 + 12 * 1.055 + 4}] >>",
+}
+FIELD_MAP = {"name": "patientFullName", "notes": "problem1_statement", "code": "mrn", "level": "levelOfCare"}
+
+def classic_pdf():
+    out, offsets = bytearray(b"%PDF-1.7\n"), {}
+    for num, body in OBJECTS.items():
+        offsets[num] = len(out)
+        out += f"{num} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    size = max(OBJECTS) + 1
+    out += f"xref\n0 {size}\n0000000000 65535 f \n".encode()
+    for num in range(1, size):
+        out += (f"{offsets[num]:010d} 00000 n \n" if num in offsets else "0000000000 65535 f \n").encode()
+    out += f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+def xref_stream_pdf():
+    nums = sorted(OBJECTS)
+    bodies = [OBJECTS[n].encode("latin-1") + b"\n" for n in nums]
+    header, off = [], 0
+    for n, b in zip(nums, bodies):
+        header.append(f"{n} {off}")
+        off += len(b)
+    header = (" ".join(header) + "\n").encode()
+    objstm, xrefstm = max(nums) + 1, max(nums) + 2
+    packed = zlib.compress(header + b"".join(bodies))
+    out = bytearray(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+    stm_off = len(out)
+    out += (f"{objstm} 0 obj\n<< /Type /ObjStm /N {len(nums)} /First {len(header)} /Filter /FlateDecode "
+            f"/Length {len(packed)} >>\nstream\n").encode() + packed + b"\nendstream\nendobj\n"
+    xref_off = len(out)
+    rows = bytearray(b"\x00" + (0).to_bytes(4, "big") + (65535).to_bytes(2, "big"))
+    for num in range(1, xrefstm + 1):
+        if num in OBJECTS:
+            rows += b"\x02" + objstm.to_bytes(4, "big") + nums.index(num).to_bytes(2, "big")
+        elif num == objstm:
+            rows += b"\x01" + stm_off.to_bytes(4, "big") + (0).to_bytes(2, "big")
+        elif num == xrefstm:
+            rows += b"\x01" + xref_off.to_bytes(4, "big") + (0).to_bytes(2, "big")
+        else:
+            rows += b"\x00" + (0).to_bytes(4, "big") + (65535).to_bytes(2, "big")
+    data = zlib.compress(bytes(rows))
+    out += (f"{xrefstm} 0 obj\n<< /Type /XRef /Size {xrefstm + 1} /W [1 4 2] /Root 1 0 R /Filter /FlateDecode "
+            f"/Length {len(data)} >>\nstream\n").encode() + data + b"\nendstream\nendobj\n"
+    out += f"startxref\n{xref_off}\n%%EOF\n".encode()
+    return bytes(out)
+
+def main():
+    results = []
+    def check(label, ok, detail=""):
+        results.append(ok)
+        print(f"{'✅' if ok else '❌'} {label}" + (f": {detail}" if not ok and detail else ""))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {}
+        for kind, build in (("classic xref", classic_pdf), ("xref stream + ObjStm", xref_stream_pdf)):
+            paths[kind] = os.path.join(tmp, kind.split()[0] + ".pdf")
+            with open(paths[kind], "wb") as f:
+                f.write(build())
+        layouts = {}
+        for kind, path in paths.items():
+            try:
+                doc = pdf_form.Document.open(path)
+                fields = dict(doc.text_fields())
+                layouts[kind] = fields
+                check(f"{kind}: all text fields found on page 0", sorted(fields) == sorted(FIELD_MAP)
+                      and all(a["page"] == 0 for a in fields.values()), str(sorted(fields)))
+                check(f"{kind}: DA, flags and MaxLen read (inherited DA included)",
+                      pdf_form.default_appearance(fields["name"]["DA"]) == ("Cour", 10.0)
+                      and pdf_form.default_appearance(fields["level"]["DA"]) == ("Cour", 0.0)
+                      and fields["notes"]["Ff"] & pdf_form.FF_MULTILINE and fields["code"].get("MaxLen") == 8,
+                      str(fields))
+            except pdf_form.FormError as e:
+                check(f"{kind}: parses", False, str(e))
+        check("both layouts agree", len(layouts) == 2 and list(layouts.values())[0] == list(layouts.values())[1])
+
+        template = overflow.Template(paths["xref stream + ObjStm"], FIELD_MAP.keys())
+        def measure(field, text):
+            return template.fields[field].measure(text)
+        m = measure("name", "x" * 10)
+        check("single line: exactly full box fits", not m["overflow"] and m["text_width"] == 60.0 and m["box_width"] == 60.0, str(m))
+        m = measure("name", "x" * 11)
+        check("single line: one glyph more overflows, widths reported", m["overflow"] and m["text_width"] == 66.0, str(m))
+        m = measure("notes", "aaaa bbbb cccc dddd eeee ffff")
+        check("multiline: wraps at spaces into 3 lines that fit", not m["overflow"] and m["lines"] == 3 and m["max_lines"] == 3, str(m))
+        m = measure("notes", "aaaa bbbb cccc dddd eeee ffff gggg")
+        check("multiline: a 4th line overflows", m["overflow"] and m["lines"] == 4, str(m))
+        m = measure("notes", "a" * 25)
+        check("multiline: a long word breaks between characters", m["lines"] == 3 and not m["overflow"], str(m))
+        m = measure("notes", "one\ntwo\nthree\nfour")
+        check("multiline: explicit newlines count", m["lines"] == 4 and m["overflow"], str(m))
+        m = measure("code", "12345678")
+        check("MaxLen: at the limit fits", not m["overflow"], str(m))
+        m = measure("code", "123456789")
+        check("MaxLen: over the limit overflows though it fits the box", m["overflow"] and m["text_width"] < m["box_width"], str(m))
+        m = measure("level", "2.1")
+        check("auto size: short text stays at 12pt", m["size"] == 12.0 and not m["overflow"], str(m))
+        m = measure("level", "x" * 9)
+        check("auto size: shrinks in 0.5pt steps until it fits", m["size"] == 6.5 and not m["overflow"], str(m))
+        m = measure("level", "x" * 12)
+        check("auto size: overflows when 6pt is not enough", m["overflow"] and m["size"] == 6.0, str(m))
+
+        plans = []
+        for name, content in (("bad", "{"), ("list", "[1]"),
+                              ("strings", json.dumps({"patientFullName": "Ann", "problems": ["Housing unstable"]})),
+                              ("good", json.dumps({"patientFullName": "x" * 11, "mrn": "1", "levelOfCare": "2.1",
+                                                   "problems": [{"statement": "short"}]}))):
+            plans.append(os.path.join(tmp, f"{name}.json"))
+            with open(plans[-1], "w") as f:
+                f.write(content)
+        plans.append(os.path.join(tmp, "missing.json"))
+        got = {os.path.basename(p): (err, res) for p, _, res, err in overflow.predict_batch(plans, paths["classic xref"], FIELD_MAP)}
+        check("batch: every plan reported", len(got) == len(plans), str(sorted(got)))
+        check("batch: unreadable and non-object plans are errors",
+              all(got[n][0] and not got[n][1] for n in ("bad.json", "list.json", "missing.json")), str(got))
+        check("batch: string problems are measured as empty, not a crash",
+              got["strings.json"][0] is None and len(got["strings.json"][1]) == 4, str(got["strings.json"]))
+        check("batch: plans after the bad ones are measured",
+              got["good.json"][0] is None and [r["field"] for r in got["good.json"][1] if r["overflow"]] == ["name"],
+              str(got["good.json"]))
+
+        map_path = os.path.join(tmp, "map.json")
+        with open(map_path, "w") as f:
+            json.dump(FIELD_MAP, f)
+        r = subprocess.run([sys.executable, os.path.join(ROOT, "agent", "asm.py"), "pdf.overflow", "--pdf", paths["classic xref"],
+                            "--map", map_path, "--plans"] + plans, capture_output=True, text=True)
+        check("asm.py pdf.overflow reports failures and continues",
+              r.returncode == 1 and r.stderr.count("failed:") == 3 and "Traceback" not in r.stderr
+              and "good.json: name text 66pt wide, box 60pt" in r.stdout, r.stdout + r.stderr)
+
+        junk = os.path.join(tmp, "junk.pdf")
+        with open(junk, "wb") as f:
+            f.write(b"%PDF-1.7\nnot a form\n")
+        try:
+            pdf_form.Document.open(junk)
+            check("a file without a catalog raises FormError", False)
+        except pdf_form.FormError:
+            check("a file without a catalog raises FormError", True)
+
+    if not all(results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
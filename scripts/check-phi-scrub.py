@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Behavioral checks for agent/phi_scrub.py.
+
+Scrubs synthetic records that exercise each known leak and fails if any
+identifying value survives.
+
+Exit codes:
+  0 = OK
+  1 = PHI leaked or a token was mangled
+"""
+import json, os, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "agent"))
+from phi_scrub import Scrubber, iter_records
+
+KEY = b"check-phi-scrub"
+
+CASES = [
+    ("ruled object is scrubbed as a whole", {
+        "demographics": {
+            "first_name": "Ann", "last_name": "Lee",
+            "address": {"street": "12 Oak Street", "city": "Philadelphia", "zip": "19104"},
+            "emergency_contact": {"name": "Rosa Lee", "phone": "2155550102"},
+        },
+    }, ["Oak Street", "Philadelphia", "19104", "Rosa", "2155550102"], []),
+    ("titles are not name parts", {
+        "visit_history": [{"provider": "Dr. Sarah Chen", "fin": "FIN2025110801"}],
+        "notes": "Seen by Dr. Smith, then Dr. Chen.",
+    }, ["Smith", "Chen", "Sarah"], ["Dr. NAME-"]),
+    ("known names match whole words only", {
+        "demographics": {"first_name": "Ann", "last_name": "Lee"},
+        "notes": "Annual review with Ann; Leeds clinic.",
+    }, ["Ann;", "with Ann"], ["Annual", "Leeds"]),
+    ("phone numbers without separators", {
+        "notes": "Call 2155550102 or (215) 555-0101 or 215.555.0103.",
+    }, ["2155550102", "555-0101", "555.0103"], ["[PHONE]"]),
+]
+
+def main():
+    failed = 0
+    scrubber = Scrubber(KEY)
+    for label, rec, leaked, expected in CASES:
+        out = json.dumps(scrubber.scrub(rec))
+        errs = [f"leaked {s!r}" for s in leaked if s in out] + [f"missing {s!r}" for s in expected if s not in out]
+        failed += bool(errs)
+        print(f"{'❌' if errs else '✅'} {label}" + (f": {'; '.join(errs)}\n   {out}" if errs else ""))
+    # Every test patient's own identifiers must be gone after scrubbing
+    for rec in iter_records(os.path.join(ROOT, "data", "test_patients.json")):
+        out = json.dumps(scrubber.scrub(rec))
+        d = rec.get("demographics", {})
+        left = [v for v in (rec.get("mrn"), d.get("last_name"), d.get("phone"), d.get("email")) if v and v in out]
+        if left:
+            failed += 1
+            print(f"❌ test patient {rec.get('mrn')}: leaked {left}")
+    if failed:
+        sys.exit(1)
+    print("✅ test_patients.json identifiers scrubbed")
+
+if __name__ == "__main__":
+    main()
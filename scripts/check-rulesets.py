@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Behavioral checks for agent/rulesets.py (asm.py rules.*).
+
+Builds throwaway editions from the app's bundled rules and checks routing:
+the app's ruleset_hash (RulesChecksum.compute, recomputed here independently)
+resolves in full and in its uppercase 12-char footer form, version pins and
+the default pick the right edition, and the compiled-ruleset cache stays
+within its measured memory budget and its entry cap.
+
+Exit codes:
+  0 = OK
+  1 = A check failed
+"""
+import hashlib, json, os, shutil, sys, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "agent"))
+import rulesets
+
+APP_RULES = os.path.join(ROOT, "ios", "ASAMAssessment", "ASAMAssessment", "rules")
+SWIFT_FILES = ["anchors.json", "wm_ladder.json", "loc_indication.guard.json",
+               "validation_rules.json", "operators.json", "clinical_thresholds.json"]
+
+def app_hash(d):
+    """RulesChecksum.compute: SHA-256 of "edition:v4\\n" + the six files concatenated."""
+    data = b"edition:v4\n"
+    for name in SWIFT_FILES:
+        with open(os.path.join(d, name), "rb") as f:
+            data += f.read()
+    return hashlib.sha256(data).hexdigest()
+
+def make_edition(src, dst, version, priority_bump=0):
+    shutil.copytree(src, dst)
+    p = os.path.join(dst, rulesets.WM_FILE)
+    with open(p, "r", encoding="utf-8") as f:
+        wm = json.load(f)
+    wm["version"] = version
+    for r in rulesets._rules_of(wm):
+        r["priority"] = r.get("priority", 0) + priority_bump
+    with open(p, "w", encoding="utf-8") as f:
+        json.dump(wm, f, indent=2)
+
+def main():
+    results = []
+    def check(label, ok, detail=""):
+        results.append(ok)
+        print(f"{'✅' if ok else '❌'} {label}" + (f": {detail}" if not ok and detail else ""))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        current = os.path.join(tmp, "rules")
+        make_edition(APP_RULES, current, "2.0.0")
+        old = os.path.join(tmp, "rules", "editions", "asam3", "1.5.0")
+        make_edition(APP_RULES, old, "1.5.0", priority_bump=1)
+        reg = rulesets.RulesetRegistry([current])
+        by_version = {i.version: i for i in reg.rulesets()}
+
+        full = app_hash(current)
+        check("ruleset_hash matches RulesChecksum.compute", by_version["2.0.0"].sha256 == full,
+              f"{by_version['2.0.0'].sha256} != {full}")
+        check("full ruleset_hash resolves", reg.resolve({"ruleset_hash": app_hash(old)}).path == old)
+        check("12-char footer form resolves (uppercase)", reg.resolve({"ruleset_hash": full[:12].upper()}).path == current)
+        check("rules_version pin resolves", reg.resolve({"rules_version": "1.5.0"}).path == old)
+        check("default is the newest edition", reg.resolve({}).version == "2.0.0")
+        try:
+            reg.resolve({"ruleset_hash": "0" * 12})
+            check("unknown ruleset_hash is an error", False)
+        except rulesets.RulesetError:
+            check("unknown ruleset_hash is an error", True)
+
+        res = reg.evaluate({"ruleset_hash": full[:12], "severities": {}})
+        check("evaluation reports the app's ruleset_hash", res["ruleset_hash"] == full, res["ruleset_hash"])
+        reg.evaluate({"rules_version": "1.5.0"})
+        sizes = [rs.size for rs in reg._cache.values()]
+        check("compiled rulesets are measured", len(sizes) == 2 and all(n > 0 for n in sizes)
+              and reg.stats["bytes"] == sum(sizes) and reg.stats["evictions"] == 0, str(reg.stats))
+        tight = rulesets.RulesetRegistry([current], budget_bytes=int(max(sizes) * 1.5))  # room for one, not two
+        tight.evaluate({"rules_version": "1.5.0"})
+        tight.evaluate({})
+        check("memory budget evicts compiled rulesets", tight.stats["evictions"] == 1 and len(tight._cache) == 1
+              and tight.stats["bytes"] <= tight.budget, str(tight.stats))
+        capped = rulesets.RulesetRegistry([current], max_compiled=1)
+        capped.evaluate({"rules_version": "1.5.0"})
+        capped.evaluate({})
+        check("max_compiled caps the entry count", len(capped._cache) == 1 and capped.stats["evictions"] == 1, str(capped.stats))
+
+        partial = os.path.join(tmp, "partial")
+        shutil.copytree(current, partial, ignore=shutil.ignore_patterns("clinical_thresholds.json", "editions"))
+        info = rulesets.RulesetInfo(partial)
+        check("no ruleset_hash without clinical_thresholds.json", info.sha256 is None)
+
+        clash = os.path.join(tmp, "clash")
+        make_edition(APP_RULES, clash, "2.0.0", priority_bump=5)
+        try:
+            rulesets.RulesetRegistry([current, clash])
+            check("same edition/version with different rules is an error", False)
+        except rulesets.RulesetError:
+            check("same edition/version with different rules is an error", True)
+
+    reg = rulesets.RulesetRegistry()
+    check("repo rules: app bundle hash resolves", reg.resolve({"ruleset_hash": app_hash(APP_RULES)[:12]}).path == APP_RULES)
+    if not all(results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Behavioral checks for agent_ops/tools/task_journal.py.
+
+Copies TODO_INDEX.json into a temp docs dir and has several processes
+append status events at once, then checks that no update was lost or
+torn, that state() sees them all without touching the snapshot, and that
+compaction advances journal_offset and fires on_snapshot (the MASTER_TODO.md
+re-render) only when the task digest changes.
+
+Exit codes:
+  0 = OK
+  1 = A check failed
+"""
+import json, os, shutil, subprocess, sys, tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOOLS = os.path.join(ROOT, "agent_ops", "tools")
+sys.path.insert(0, TOOLS)
+from task_journal import TaskJournal
+
+WORKERS = 6
+EVENTS = 40  # per worker, one append() call each
+
+# Worker i toggles task i and ends on "done" for even i, "open" for odd i
+WORKER = """
+import sys
+sys.path.insert(0, {tools!r})
+from task_journal import TaskJournal
+j = TaskJournal({docs!r})
+i, task = int(sys.argv[1]), sys.argv[2]
+for n in range({events}):
+    last = n == {events} - 1
+    status = ("done" if i % 2 == 0 else "open") if last else ("open", "done")[n % 2]
+    j.append([{{"task": task, "status": status, "worker": i, "n": n}}])
+"""
+
+def main():
+    results = []
+    def check(label, ok, detail=""):
+        results.append(ok)
+        print(f"{'✅' if ok else '❌'} {label}" + (f": {detail}" if not ok and detail else ""))
+
+    with tempfile.TemporaryDirectory() as docs:
+        shutil.copy(os.path.join(ROOT, "agent_ops", "docs", "TODO_INDEX.json"), docs)
+        index = os.path.join(docs, "TODO_INDEX.json")
+        with open(index, "rb") as f:
+            original = f.read()
+        renders = []
+        journal = TaskJournal(docs, compact_every=10 ** 6, on_snapshot=renders.append)
+        ids = [t["id"] for t in journal.load_snapshot()["tasks"]][:WORKERS]
+
+        code = WORKER.format(tools=TOOLS, docs=docs, events=EVENTS)
+        procs = [subprocess.Popen([sys.executable, "-c", code, str(i), task]) for i, task in enumerate(ids)]
+        check("concurrent appenders exit cleanly", all(p.wait() == 0 for p in procs))
+
+        with open(journal.journal_path, "rb") as f:
+            lines = f.read().splitlines()
+        try:
+            events = [json.loads(line) for line in lines]
+        except ValueError as e:
+            events = []
+            check("journal lines are whole JSON objects", False, str(e))
+        check("no lost updates", len(events) == WORKERS * EVENTS, f"{len(events)} of {WORKERS * EVENTS}")
+        per_worker = [sorted(e["n"] for e in events if e.get("worker") == i) for i in range(len(ids))]
+        check("each worker's events are all present once", all(ns == list(range(EVENTS)) for ns in per_worker))
+
+        st = journal.state()
+        status = {t["id"]: t["status"] for t in st["tasks"]}
+        check("state() applies every pending event", st["pending_events"] == WORKERS * EVENTS
+              and all(status[t] == ("done" if i % 2 == 0 else "open") for i, t in enumerate(ids)), str(status))
+        with open(index, "rb") as f:
+            check("state() does not rewrite the snapshot", f.read() == original)
+
+        check("below compact_every nothing is compacted", journal.compact() is False and not renders)
+        size = os.path.getsize(journal.journal_path)
+        changed = journal.compact(force=True)
+        snap = journal.load_snapshot()
+        check("compaction advances journal_offset to the end", snap.get("journal_offset") == size, str(snap.get("journal_offset")))
+        check("compaction with task changes re-renders once", changed is True and len(renders) == 1, str(len(renders)))
+        check("snapshot keeps the folded statuses", {t["id"]: t["status"] for t in snap["tasks"]} == status)
+        check("state() after compaction has nothing pending", journal.state()["pending_events"] == 0)
+
+        check("compacting again does not re-render", journal.compact(force=True) is False and len(renders) == 1)
+        journal.append([{"task": ids[0], "status": status[ids[0]]}])  # no-op status change
+        changed = journal.compact(force=True)
+        check("events that leave the digest unchanged do not re-render",
+              changed is False and len(renders) == 1 and journal.load_snapshot()["journal_offset"] == os.path.getsize(journal.journal_path))
+
+    if not all(results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Behavioral checks for agent/tracing.py (asm.py --trace).
+
+Records nested spans in both output formats and checks parent links,
+per-root sampling, that an unserializable attribute does not lose the
+trace, and that bad settings fail with a clear error instead of a
+traceback.
+
+Exit codes:
+  0 = OK
+  1 = A check failed
+"""
+import atexit, json, os, subprocess, sys, tempfile, threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "agent"))
+import tracing
+
+def traced(path, fmt=None, rate=1.0, body=None):
+    """Run body() under a fresh tracer writing to path and flush it."""
+    t = tracing._tracer = tracing.Tracer(path, fmt, rate)
+    atexit.unregister(t.flush)  # flushed here; the temp dir is gone by exit
+    try:
+        body()
+    finally:
+        tracing._tracer = None
+    t.flush()
+    return t
+
+def nested():
+    with tracing.span("root", n=1):
+        with tracing.span("child", obj=object()) as s:
+            s.set(items={1, 2})
+            with tracing.span("grandchild"):
+                pass
+    def in_thread():
+        with tracing.span("thread.root"):
+            pass
+    worker = threading.Thread(target=in_thread)
+    worker.start(); worker.join()
+
+def main():
+    results = []
+    def check(label, ok, detail=""):
+        results.append(ok)
+        print(f"{'✅' if ok else '❌'} {label}" + (f": {detail}" if not ok and detail else ""))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        jl = os.path.join(tmp, "trace.jsonl")
+        traced(jl, body=nested)
+        with open(jl) as f:
+            spans = {s["name"]: s for s in map(json.loads, f)}
+        ok = set(spans) == {"root", "child", "grandchild", "thread.root"}
+        check("jsonl: every span written", ok, str(sorted(spans)))
+        if ok:
+            check("jsonl: children point at their parent",
+                  spans["root"]["parent_id"] is None and spans["child"]["parent_id"] == spans["root"]["span_id"]
+                  and spans["grandchild"]["parent_id"] == spans["child"]["span_id"], str(spans))
+            check("jsonl: a span in another thread is its own root", spans["thread.root"]["parent_id"] is None)
+            check("jsonl: unserializable attributes are stringified", isinstance(spans["child"]["attrs"]["obj"], str))
+
+        ch = os.path.join(tmp, "trace.json")
+        try:
+            traced(ch, body=nested)
+            with open(ch) as f:
+                events = {e["name"]: e for e in json.load(f)["traceEvents"]}
+            check("chrome: unserializable attributes do not lose the trace", len(events) == 4, str(sorted(events)))
+            check("chrome: complete events with parent links", all(e["ph"] == "X" for e in events.values())
+                  and events["grandchild"]["args"]["parent_id"] == events["child"]["args"]["span_id"])
+        except (OSError, TypeError, ValueError) as e:
+            check("chrome: unserializable attributes do not lose the trace", False, str(e))
+
+        sampled = os.path.join(tmp, "sampled.jsonl")
+        traced(sampled, rate=0.5, body=lambda: [nested() for _ in range(200)])
+        with open(sampled) as f:
+            by_parent = {}
+            for s in map(json.loads, f):
+                by_parent[s["name"]] = by_parent.get(s["name"], 0) + 1
+        roots = by_parent.get("root", 0)
+        check("sampling keeps about the requested fraction of roots", 60 <= roots <= 140, str(by_parent))
+        check("children follow their root's sampling decision",
+              by_parent.get("child") == by_parent.get("grandchild") == roots, str(by_parent))
+        none = os.path.join(tmp, "none.jsonl")
+        traced(none, rate=0.0, body=nested)
+        check("sample rate 0 records nothing", not os.path.exists(none))
+
+        env = {k: v for k, v in os.environ.items() if not k.startswith("ASM_")}
+        for label, extra, args in (("invalid ASM_TRACE_SAMPLE", {"ASM_TRACE_SAMPLE": "10%"}, []),
+                                   ("out-of-range --trace-sample", {}, ["--trace-sample", "1.5"]),
+                                   ("unknown ASM_TRACE_FORMAT", {"ASM_TRACE_FORMAT": "xml"}, [])):
+            r = subprocess.run([sys.executable, os.path.join(ROOT, "agent", "asm.py"), "--trace", os.path.join(tmp, "t.json")]
+                               + args + ["rand.id"], env=dict(env, **extra), cwd=tmp, capture_output=True, text=True)
+            check(f"{label} is a clear error", r.returncode == 2 and r.stderr.startswith("error:")
+                  and "Traceback" not in r.stderr, r.stderr.strip()[-200:])
+
+    if not all(results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()